@@ -1,8 +1,17 @@
 from .ranking import BalancedRanking
+from .ranking import CompactRanking
 from .ranking import CreditRanking
 from .ranking import ProbabilisticRanking
 from .ranking import TeamRanking
 from .ranking import PairwisePreferenceRanking
+from .ranking import RankIndex
+from .ranking import Vocabulary
+
+from .alias_table import AliasTable
+from .distribution_cache import DistributionCache
+from .outcome_aggregator import OutcomeAggregator
+from .rng import check_random_state
+from .rng import spawn
 
 from .balanced import Balanced
 from .probabilistic import Probabilistic
@@ -0,0 +1,92 @@
+from .rng import check_random_state
+import numpy as np
+
+
+class AliasTable(object):
+    '''
+    Alias table for sampling from a discrete distribution in O(1)
+    (Vose, "A linear algorithm for generating random numbers with a given
+    distribution", IEEE TSE 1991)
+
+    Args:
+        probabilities: a list of probabilities (normalized in the
+                       initialization)
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
+
+    Attributes:
+        thresholds: thresholds[i] is the probability of keeping i
+                    when the i-th column is chosen
+        aliases: aliases[i] is returned when the i-th column is chosen
+                 but i is not kept
+    '''
+
+    def __init__(self, probabilities, random_state=None):
+        '''
+        probabilities: a list of probabilities (normalized in the
+                       initialization)
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
+        '''
+        self.random_state = check_random_state(random_state)
+        probabilities = np.asarray(probabilities, dtype=float)
+        if len(probabilities) == 0:
+            raise ValueError('probabilities must not be empty')
+        total = np.sum(probabilities)
+        if not total > 0 or (probabilities < 0).any():
+            raise ValueError('probabilities must be non-negative '
+                + 'and must not be all zero')
+        size = len(probabilities)
+        scaled = probabilities * size / total
+        self.thresholds = np.ones(size)
+        self.aliases = np.arange(size)
+        small = [i for i in range(size) if scaled[i] < 1.0]
+        large = [i for i in range(size) if scaled[i] >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.thresholds[s] = scaled[s]
+            self.aliases[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # the remaining columns are full up to rounding errors
+        for i in small + large:
+            self.thresholds[i] = 1.0
+        # Python lists make scalar sampling faster than NumPy indexing
+        self._thresholds = self.thresholds.tolist()
+        self._aliases = self.aliases.tolist()
+
+    def __len__(self):
+        return len(self._thresholds)
+
+    def sample(self):
+        '''
+        Return an index sampled from the distribution
+        '''
+        u = self.random_state.random() * len(self._thresholds)
+        i = int(u)
+        if u - i < self._thresholds[i]:
+            return i
+        else:
+            return self._aliases[i]
+
+    def sample_many(self, n):
+        '''
+        Return an array of `n` indices sampled from the distribution
+        '''
+        u = self.random_state.random(n) * len(self._thresholds)
+        i = u.astype(int)
+        return np.where(u - i < self.thresholds[i], i, self.aliases[i])
+
+    def dumpd(self):
+        return {
+            'thresholds': self._thresholds,
+            'aliases': self._aliases,
+        }
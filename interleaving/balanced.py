@@ -17,9 +17,14 @@ class Balanced(InterleavingMethod):
                     Otherwise, `sample_num` rankings are sampled in the
                     initialization, one of which is returned when `interleave`
                     is called.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
     '''
 
-    def __init__(self, lists, max_length=None, sample_num=None):
+    def __init__(self, lists, max_length=None, sample_num=None,
+        random_state=None):
         '''
         lists: two lists of document IDs
         max_length: the maximum length of resultant interleaving.
@@ -30,23 +35,31 @@ class Balanced(InterleavingMethod):
                     Otherwise, `sample_num` rankings are sampled in the
                     initialization, one of which is returned when `interleave`
                     is called.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
         '''
         if len(lists) != 2:
             raise ValueError('lists must be two rankings')
         super(Balanced, self).__init__(lists,
-            max_length=max_length, sample_num=sample_num)
+            max_length=max_length, sample_num=sample_num,
+            random_state=random_state)
 
-    def _sample(self, max_length, lists):
+    def _sample(self, max_length, lists, is_a_first=None):
         '''
         Sample a ranking
 
         max_length: the maximum length of resultant interleaving
         *lists: lists of document IDs
+        is_a_first: whether the first document is taken from lists[0].
+                    If this is None (default), it is randomly determined.
 
         Return an instance of Ranking
         '''
         a, b = lists[0], lists[1]
-        is_a_first = np.random.randint(0, 2) == 0
+        if is_a_first is None:
+            is_a_first = self.random_state.choice(2) == 0
         result = BalancedRanking()
         k_a = 0
         k_b = 0
@@ -62,6 +75,24 @@ class Balanced(InterleavingMethod):
                 k_b += 1
         result.a = a
         result.b = b
+        result.rank_index = self._get_rank_index(lists, self.rank_index)
+        return result
+
+    def _sample_many(self, n, max_length, lists):
+        '''
+        Sample `n` rankings.
+        Only two rankings are possible in balanced interleaving,
+        so that each of them is built once and copied.
+        '''
+        rankings = {flag: self._sample(max_length, lists, is_a_first=flag)
+            for flag in (True, False)}
+        result = []
+        for flag in self.random_state.choice(2, size=n) == 0:
+            ranking = BalancedRanking(rankings[flag])
+            ranking.a = lists[0]
+            ranking.b = lists[1]
+            ranking.rank_index = rankings[flag].rank_index
+            result.append(ranking)
         return result
 
     @classmethod
@@ -74,11 +105,54 @@ class Balanced(InterleavingMethod):
         '''
         if len(clicks) == 0:
             return [0, 0]
+        index = cls._get_rank_index([ranking.a, ranking.b],
+            getattr(ranking, 'rank_index', None))
         c_max = np.max(clicks)
         r_max = ranking[c_max]
-        k_a = ranking.a.index(r_max) if r_max in ranking.a else len(ranking.a)
-        k_b = ranking.b.index(r_max) if r_max in ranking.b else len(ranking.b)
-        k = np.min([k_a, k_b])
-        h_a = len([c for c in clicks if ranking[c] in ranking.a[:k+1]])
-        h_b = len([c for c in clicks if ranking[c] in ranking.b[:k+1]])
+        k = min(index.ranks(r_max))
+        h_a = len([c for c in clicks if index.is_within(0, ranking[c], k)])
+        h_b = len([c for c in clicks if index.is_within(1, ranking[c], k)])
         return [h_a, h_b]
+
+    @classmethod
+    def compute_scores_batch(cls, rankings, clicks_list):
+        '''
+        rankings: a list of instances of BalancedRanking
+        clicks_list: a list of lists of indices clicked by users
+
+        Return an array of shape (len(rankings), 2)
+        storing the score of each ranker in each impression.
+        '''
+        uniques, slots, impressions, positions\
+            = cls._flatten_clicks(rankings, clicks_list)
+        max_length = max([len(r) for r in uniques], default=0)
+        # ranks[u, x, k]: rank of the k-th document in original list x
+        # (len(x) if the document is not included)
+        ranks = np.zeros((len(uniques), 2, max_length), dtype=int)
+        included = np.zeros((len(uniques), 2, max_length), dtype=bool)
+        indices = {}
+        for u, ranking in enumerate(uniques):
+            for x, l in enumerate([ranking.a, ranking.b]):
+                if not id(l) in indices:
+                    indices[id(l)] = (l, {docid: r for r, docid in enumerate(l)})
+                index = indices[id(l)][1]
+                ranks[u, x, :len(ranking)]\
+                    = [index.get(docid, len(l)) for docid in ranking]
+                included[u, x, :len(ranking)]\
+                    = [docid in index for docid in ranking]
+
+        # the lowest clicked index of each impression
+        c_max = np.full(len(rankings), -1, dtype=int)
+        np.maximum.at(c_max, impressions, positions)
+        clicked = c_max >= 0
+        k = np.zeros(len(rankings), dtype=int)
+        k[clicked] = np.min(ranks[slots[clicked], :, c_max[clicked]], axis=1)
+
+        click_slots = slots[impressions]
+        result = np.zeros((len(rankings), 2))
+        for x in range(2):
+            is_hit = included[click_slots, x, positions]\
+                & (ranks[click_slots, x, positions] <= k[impressions])
+            result[:, x] = np.bincount(impressions, weights=is_hit,
+                minlength=len(rankings))
+        return result
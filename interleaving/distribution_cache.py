@@ -0,0 +1,141 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+
+class DistributionCache(object):
+    '''
+    Cache of ranking distributions solved by Optimized (or its subclasses),
+    keyed by a canonical hash of the input lists and parameters.
+    Distributions are kept in an in-memory LRU tier and,
+    if `directory` is given, in an on-disk tier shared across processes.
+
+    Args:
+        max_entries: the maximum number of distributions in memory.
+                     The least recently used one is evicted when exceeded.
+        directory: a directory for the on-disk tier (optional).
+                   Files are pickled, so only trusted directories should
+                   be used.
+
+    Attributes:
+        hits: the number of lookups found in memory
+        disk_hits: the number of lookups found on disk
+        misses: the number of lookups found nowhere
+    '''
+
+    def __init__(self, max_entries=1024, directory=None):
+        '''
+        max_entries: the maximum number of distributions in memory.
+                     The least recently used one is evicted when exceeded.
+        directory: a directory for the on-disk tier (optional).
+                   Files are pickled, so only trusted directories should
+                   be used.
+        '''
+        if max_entries < 1:
+            raise ValueError('max_entries must be positive')
+        self.max_entries = max_entries
+        self.directory = directory
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*args):
+        '''
+        Return a canonical hash of the arguments,
+        e.g. (class name, lists, max_length, sample_num, credit_func)
+        '''
+        s = json.dumps(args, default=repr, separators=(',', ':'))
+        return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        '''
+        Return a pair of rankings and probabilities for `key`,
+        or None if it is not cached
+        '''
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        value = self._load(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self._put_in_memory(key, value)
+        return value
+
+    def put(self, key, value):
+        '''
+        Cache a pair of rankings and probabilities for `key`
+        '''
+        with self._lock:
+            self._put_in_memory(key, value)
+        self._dump(key, value)
+
+    def _put_in_memory(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def _load(self, key):
+        if self.directory is None or not os.path.exists(self._path(key)):
+            return None
+        with open(self._path(key), 'rb') as f:
+            return pickle.load(f)
+
+    def _dump(self, key, value):
+        if self.directory is None:
+            return
+        # write to a temporary file first so that readers never see
+        # a partially written file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.directory is not None and os.path.exists(self._path(key))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        '''
+        Clear the in-memory tier and the counters
+        (files in the on-disk tier are kept)
+        '''
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self):
+        '''
+        Return a dict of the counters and the number of entries in memory
+        '''
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+        }
@@ -1,4 +1,9 @@
+from .alias_table import AliasTable
+from .ranking import RankIndex
+from .ranking import Vocabulary
+from .rng import check_random_state
 from collections import defaultdict
+import itertools
 import json
 import numpy as np
 
@@ -17,9 +22,14 @@ class InterleavingMethod(object):
                     Otherwise, `sample_num` rankings are sampled in the
                     initialization, one of which is returned when `interleave`
                     is called.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
     '''
 
-    def __init__(self, lists, max_length=None, sample_num=None):
+    def __init__(self, lists, max_length=None, sample_num=None,
+        random_state=None):
         '''
         lists: lists of document IDs
         max_length: the maximum length of resultant interleaving.
@@ -30,12 +40,19 @@ class InterleavingMethod(object):
                     Otherwise, `sample_num` rankings are sampled in the
                     initialization, one of which is returned when `interleave`
                     is called.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
         '''
         self.max_length = max_length
         if self.max_length is None:
             self.max_length = min([len(l) for l in lists])
         self.sample_num = sample_num
         self.lists = lists
+        self.random_state = check_random_state(random_state)
+        self.rank_index = RankIndex(lists)
+        self._vocabulary = None
         if self.sample_num:
             self._sample_rankings()
 
@@ -48,6 +65,27 @@ class InterleavingMethod(object):
             ranking = self._sample(self.max_length, self.lists)
             distribution[ranking] += 1.0 / self.sample_num
         self._rankings, self._probabilities = zip(*distribution.items())
+        self._build_alias_table()
+
+    def _build_alias_table(self):
+        '''
+        Build an alias table of `self._probabilities`
+        so that `interleave` samples a ranking in O(1)
+        '''
+        self._alias_table = AliasTable(self._probabilities,
+            random_state=self.random_state)
+
+    def set_random_state(self, random_state):
+        '''
+        Replace the random state used for sampling,
+        e.g. with a random stream of a worker process
+
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState
+        '''
+        self.random_state = check_random_state(random_state)
+        if self.sample_num:
+            self._alias_table.random_state = self.random_state
 
     def _sample(self, max_length, lists):
         '''
@@ -60,6 +98,19 @@ class InterleavingMethod(object):
         '''
         raise NotImplementedError()
 
+    def _sample_many(self, n, max_length, lists):
+        '''
+        Sample `n` rankings
+
+        n: the number of rankings
+        max_length: the maximum length of resultant interleaving
+        lists: lists of document IDs
+
+        Return a list of instances of Ranking.
+        Subclasses override this method to draw random numbers in bulk.
+        '''
+        return [self._sample(max_length, lists) for _ in range(n)]
+
     def dump_rankings(self, file):
         '''
         Dump the sampled rankings into a file
@@ -78,11 +129,68 @@ class InterleavingMethod(object):
         Return an instance of Ranking
         '''
         if self.sample_num:
-            i = np.argmax(np.random.multinomial(1, self._probabilities))
-            return self._rankings[i]
+            return self._rankings[self._alias_table.sample()]
         else:
             return self._sample(self.max_length, self.lists)
 
+    def interleave_many(self, n):
+        '''
+        Return a list of `n` instances of Ranking,
+        each of which is generated independently as `interleave` does.
+        '''
+        if self.sample_num:
+            indices = self._alias_table.sample_many(n)
+            return [self._rankings[i] for i in indices]
+        else:
+            return self._sample_many(n, self.max_length, self.lists)
+
+    @property
+    def alias_table(self):
+        '''
+        Return an instance of AliasTable whose indices correspond to
+        rankings in `ranking_distribution`
+        if rankings are sampled in the initialization.
+        Otherwise, return None.
+        '''
+        if self.sample_num:
+            return self._alias_table
+        else:
+            return None
+
+    @property
+    def vocabulary(self):
+        '''
+        Return an instance of Vocabulary of the lists,
+        which is built when it is first accessed
+        '''
+        if self._vocabulary is None:
+            self._vocabulary = Vocabulary(self.lists)
+        return self._vocabulary
+
+    @staticmethod
+    def _get_rank_index(lists, rank_index=None):
+        '''
+        Return `rank_index` if it is built from `lists`,
+        or a new instance of RankIndex of `lists` otherwise
+        (e.g. for rankings created outside the method)
+        '''
+        if rank_index is not None and rank_index.is_built_from(lists):
+            return rank_index
+        return RankIndex(lists)
+
+    def compact(self, ranking):
+        '''
+        Convert a ranking generated by this instance
+        into an instance of CompactRanking
+        '''
+        return self.vocabulary.compact(ranking)
+
+    def expand(self, compact):
+        '''
+        Convert an instance of CompactRanking into the original ranking
+        '''
+        return self.vocabulary.expand(compact)
+
     @property
     def ranking_distribution(self):
         '''
@@ -120,6 +228,93 @@ class InterleavingMethod(object):
                     pass
         return result
 
+    @classmethod
+    def evaluate_batch(cls, rankings, clicks_list, chunk_size=4096):
+        '''
+        Args:
+            rankings: a list of instances of Ranking
+            clicks_list: a list of lists of indices clicked by users,
+                         each of which corresponds to a ranking in `rankings`
+            chunk_size: the number of impressions compared at once
+
+        Returns:
+            a tuple of three arrays (scores, wins, ties).
+            scores[k, i] is the score of ranker i in the k-th impression,
+            wins[i, j] is the number of impressions in which ranker i won
+            ranker j, and ties[i, j] is the number of impressions in which
+            ranker i and ranker j tied. Losses are given by wins.T.
+        '''
+        scores = cls.compute_scores_batch(rankings, clicks_list)
+        num_rankers = scores.shape[1]
+        wins = np.zeros((num_rankers, num_rankers), dtype=int)
+        ties = np.zeros((num_rankers, num_rankers), dtype=int)
+        for start in range(0, len(scores), chunk_size):
+            s = scores[start:start+chunk_size]
+            wins += np.sum(s[:, :, np.newaxis] > s[:, np.newaxis, :], axis=0)
+            ties += np.sum(s[:, :, np.newaxis] == s[:, np.newaxis, :], axis=0)
+        np.fill_diagonal(ties, 0)
+        return scores, wins, ties
+
+    @classmethod
+    def compute_scores_batch(cls, rankings, clicks_list):
+        '''
+        rankings: a list of instances of Ranking
+        clicks_list: a list of lists of indices clicked by users
+
+        Return an array of shape (len(rankings), # of rankers)
+        storing the score of each ranker in each impression.
+        Scores are computed once for the same pair of a ranking instance
+        and clicks.
+        '''
+        results = {}
+        rows = []
+        for ranking, clicks in zip(rankings, clicks_list):
+            key = (id(ranking), tuple(clicks))
+            if not key in results:
+                scores = cls.compute_scores(ranking, clicks)
+                results[key] = [scores[i] for i in range(len(scores))]
+            rows.append(results[key])
+        return cls._score_matrix(rows)
+
+    @classmethod
+    def _score_matrix(cls, rows, num_rankers=None):
+        '''
+        Return an array of shape (len(rows), num_rankers) from lists of scores
+        '''
+        if num_rankers is None:
+            num_rankers = max([len(row) for row in rows], default=0)
+        result = np.zeros((len(rows), num_rankers))
+        for k, row in enumerate(rows):
+            result[k, :len(row)] = row
+        return result
+
+    @classmethod
+    def _flatten_clicks(cls, rankings, clicks_list):
+        '''
+        rankings: a list of instances of Ranking
+        clicks_list: a list of lists of indices clicked by users
+
+        Return a tuple (uniques, slots, impressions, positions), where
+        uniques is a list of distinct ranking instances,
+        slots[k] is the index in uniques of the k-th ranking,
+        and impressions[c] and positions[c] are the impression index and
+        the clicked index of the c-th click in all the impressions.
+        '''
+        slot_of = {}
+        uniques = []
+        slots = np.zeros(len(rankings), dtype=int)
+        for k, ranking in enumerate(rankings):
+            key = id(ranking)
+            if not key in slot_of:
+                slot_of[key] = len(uniques)
+                uniques.append(ranking)
+            slots[k] = slot_of[key]
+        lengths = np.array([len(clicks) for clicks in clicks_list], dtype=int)
+        impressions = np.repeat(np.arange(len(lengths)), lengths)
+        positions = np.fromiter(itertools.chain.from_iterable(clicks_list),
+            dtype=int, count=np.sum(lengths))
+        return uniques, slots, impressions, positions
+
     @classmethod
     def compute_scores(cls, ranking, clicks):
         '''
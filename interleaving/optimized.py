@@ -1,7 +1,30 @@
+from .ranking import CompactRanking
 from .ranking import CreditRanking
+from .team_draft import TeamDraft
 from .interleaving_method import InterleavingMethod
+from .rng import spawn
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import scipy.sparse as sparse
 from scipy.optimize import linprog
+import time
+
+
+def _inverse_credit(rank):
+    return 1.0 / rank
+
+
+def _negative_credit(rank):
+    return -rank
+
+
+def _sample_in_worker(args):
+    '''
+    Sample rankings in a worker process with its own random stream
+    '''
+    method, size, random_state = args
+    method.random_state = random_state
+    return method._sample_many(size, method.max_length, method.lists)
 
 
 class Optimized(InterleavingMethod):
@@ -19,10 +42,31 @@ class Optimized(InterleavingMethod):
                     initialization, one of which is returned when `interleave`
                     is called.
         credit_func: either 'inverse' (1/rank) or 'negative' (-rank)
+        secure_sampling: if True, rankings are sampled `sample_num` times
+                         (otherwise, until `sample_num` distinct rankings
+                         are obtained)
+        n_jobs: the number of worker processes for sampling rankings.
+                If this is None (default), rankings are sampled in the
+                current process.
+        solver: a method of scipy.optimize.linprog, e.g. 'highs' (default),
+                'highs-ds' (dual simplex), or 'highs-ipm' (interior point)
+        solver_options: a dict of options passed to the solver
+        cache: an instance of DistributionCache (optional).
+               If the same lists and parameters are cached,
+               the sampling and optimization are skipped.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
+
+    Attributes:
+        solver_stats: a dict of statistics of the last optimization,
+                      including the elapsed time and the number of iterations
     '''
 
     def __init__(self, lists, max_length=None, sample_num=None,
-        credit_func='inverse', secure_sampling=False):
+        credit_func='inverse', secure_sampling=False, n_jobs=None,
+        solver='highs', solver_options=None, cache=None, random_state=None):
         '''
         lists: lists of document IDs
         max_length: the maximum length of resultant interleaving.
@@ -34,30 +78,82 @@ class Optimized(InterleavingMethod):
                     initialization, one of which is returned when `interleave`
                     is called.
         credit_func: either 'inverse' (1/rank) or 'negative' (-rank)
+        secure_sampling: if True, rankings are sampled `sample_num` times
+                         (otherwise, until `sample_num` distinct rankings
+                         are obtained)
+        n_jobs: the number of worker processes for sampling rankings.
+                If this is None (default), rankings are sampled in the
+                current process.
+        solver: a method of scipy.optimize.linprog, e.g. 'highs' (default),
+                'highs-ds' (dual simplex), or 'highs-ipm' (interior point)
+        solver_options: a dict of options passed to the solver
+        cache: an instance of DistributionCache (optional).
+               If the same lists and parameters are cached,
+               the sampling and optimization are skipped.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
         '''
         if sample_num is None:
             raise ValueError('sample_num cannot be None, '
                 + 'i.e. the initial sampling is necessary')
+        self._credit_func_name = credit_func
         if credit_func == 'inverse':
-            self._credit_func = lambda x: 1.0 / x
+            self._credit_func = _inverse_credit
         elif credit_func == 'negative':
-            self._credit_func = lambda x: -x
+            self._credit_func = _negative_credit
         else:
             raise ValueError('credit_func should be either inverse or negative')
         self._secure_sampling = secure_sampling
+        self._n_jobs = n_jobs
+        self._solver = solver
+        self._solver_options = solver_options
+        self.solver_stats = None
+        self._cache = cache
+        self._is_cached = False
         super(Optimized, self).__init__(lists,
-            max_length=max_length, sample_num=sample_num)
+            max_length=max_length, sample_num=sample_num,
+            random_state=random_state)
         # self._rankings (sampled rankings) is obtained here
-        res = self._compute_probabilities(lists, self._rankings)
-        is_success, self._probabilities, _ = res
-        self._probabilities /= np.sum(self._probabilities)
-        if not is_success:
-            raise ValueError('Optimization failed')
+        if not self._is_cached:
+            res = self._compute_probabilities(lists, self._rankings)
+            is_success, self._probabilities, _ = res
+            if not is_success:
+                raise ValueError('Optimization failed')
+            self._probabilities /= np.sum(self._probabilities)
+            if self._cache is not None:
+                self._cache.put(self._cache_key(),
+                    (self._rankings, self._probabilities))
+        self._build_alias_table()
+
+    def __getstate__(self):
+        # the cache is not sent to worker processes
+        state = self.__dict__.copy()
+        state['_cache'] = None
+        return state
+
+    def _cache_key(self):
+        '''
+        Return the key of this distribution in DistributionCache
+        '''
+        return self._cache.key(type(self).__name__, self.lists,
+            self.max_length, self.sample_num, self._credit_func_name,
+            self._secure_sampling, self._solver, self._solver_options)
 
     def _sample_rankings(self):
         '''
         Sample `sample_num` rankings
+        (or load a solved distribution from the cache)
         '''
+        if self._cache is not None and not self._is_cached:
+            cached = self._cache.get(self._cache_key())
+            if cached is not None:
+                self._rankings, self._probabilities = cached
+                self._is_cached = True
+                return
+        if self._n_jobs is not None and self._n_jobs > 1:
+            return self._sample_rankings_in_parallel()
         distribution = {}
         if self._secure_sampling:
             rankings = set()
@@ -70,44 +166,92 @@ class Optimized(InterleavingMethod):
                 ranking = self._sample(self.max_length, self.lists)
                 distribution[ranking] = 1.0 / self.sample_num
         self._rankings, self._probabilities = zip(*distribution.items())
+        self._build_alias_table()
 
+    def _sample_rankings_in_parallel(self):
+        '''
+        Sample `sample_num` rankings in `n_jobs` worker processes.
+        Each worker is given a random stream spawned from `random_state`
+        (see `interleaving.rng.spawn`) and sample rankings in
+        bulk. Rankings are deduplicated in the order of workers, so that
+        the result is determined by the random state of this process.
+        '''
+        distribution = {}
+        remaining = self.sample_num
+        with ProcessPoolExecutor(max_workers=self._n_jobs) as executor:
+            while remaining > 0:
+                size = -(-remaining // self._n_jobs)
+                sizes = [min(size, remaining - i * size)
+                    for i in range(self._n_jobs) if remaining > i * size]
+                streams = spawn(self.random_state, len(sizes))
+                tasks = [(self, sz, rs) for sz, rs in zip(sizes, streams)]
+                for rankings in executor.map(_sample_in_worker, tasks):
+                    for ranking in rankings:
+                        if self._secure_sampling\
+                            or len(distribution) < self.sample_num:
+                            distribution[ranking] = None
+                if self._secure_sampling:
+                    remaining = 0
+                else:
+                    remaining = self.sample_num - len(distribution)
+        probability = 1.0 / len(distribution) if self._secure_sampling\
+            else 1.0 / self.sample_num
+        self._rankings = tuple(distribution)
+        self._probabilities = tuple([probability] * len(self._rankings))
+        self._build_alias_table()
 
-    def _sample(self, max_length, lists):
+    def _sample(self, max_length, lists, uniforms=None):
         '''
         Prefix constraint sampling
         (Multileaved Comparisons for Fast Online Evaluation, CIKM'14)
 
         max_length: the maximum length of resultant interleaving
         lists: lists of document IDs
+        uniforms: random numbers in [0, 1) used for team selection
+                  (at least max_length + len(lists) numbers).
+                  If this is None (default), they are drawn here.
 
         Return an instance of Ranking
+        (documents are picked in amortized O(1) as in TeamDraft._sample)
         '''
+        if uniforms is None:
+            uniforms = self.random_state.random(max_length + len(lists))
         num_rankers = len(lists)
         result = CreditRanking(num_rankers)
-        teams = set(range(num_rankers))
+        teams = list(range(num_rankers))
+        placed = set()
+        cursors = [0] * num_rankers
 
+        step = 0
         while len(result) < max_length:
             if len(teams) == 0:
                 break
-            selected_team = np.random.choice(list(teams))
-            docs = [x for x in lists[selected_team] if not x in result]
-            if len(docs) > 0:
-                selected_doc = docs[0]
+            selected_team = teams[int(uniforms[step] * len(teams))]
+            step += 1
+            selected_doc = TeamDraft._next_doc(lists, selected_team,
+                cursors, placed)
+            if selected_doc is not None:
                 result.append(selected_doc)
+                placed.add(selected_doc)
             else:
                 teams.remove(selected_team)
 
         # assign credits
+        index = self._get_rank_index(lists, self.rank_index)
         for docid in result:
             for team in result.credits:
-                if docid in lists[team]:
-                    rank = lists[team].index(docid) + 1
-                else:
-                    rank = len(lists[team]) + 1
+                rank = index.rank(team, docid) + 1
                 result.credits[team][docid] = self._credit_func(rank)
 
         return result
 
+    def _sample_many(self, n, max_length, lists):
+        '''
+        Sample `n` rankings with random numbers drawn at once
+        '''
+        uniforms = self.random_state.random((n, max_length + len(lists)))
+        return [self._sample(max_length, lists, u) for u in uniforms]
+
     def _compute_probabilities(self, lists, rankings):
         '''
         Solve the optimization problem in
@@ -119,21 +263,35 @@ class Optimized(InterleavingMethod):
         Return a list of probabilities for input rankings
         '''
         # probability constraints
-        A_p_sum = np.array([1]*len(rankings))
+        A_p_sum = sparse.csr_matrix(np.ones((1, len(rankings))))
         # unbiasedness constraints
         ub_cons = self._unbiasedness_constraints(lists, rankings)
         # sensitivity
         sensitivity = self._sensitivity(lists, rankings)
 
         # constraints
-        A_eq = np.vstack((A_p_sum, ub_cons))
+        A_eq = sparse.vstack((A_p_sum, ub_cons), format='csr')
         b_eq = np.array([1.0] + [0.0]*ub_cons.shape[0])
 
         # solving the optimization problem
+        start = time.perf_counter()
         res = linprog(sensitivity, # objective function
             A_eq=A_eq, b_eq=b_eq, # constraints
-            bounds=[(0, 1)]*len(rankings) # 0 <= p <= 1
+            bounds=(0, 1), # 0 <= p <= 1
+            method=self._solver,
+            options=self._solver_options,
             )
+        self.solver_stats = {
+            'method': self._solver,
+            'success': res.success,
+            'status': res.status,
+            'message': res.message,
+            'nit': res.nit,
+            'time': time.perf_counter() - start,
+            'num_rankings': len(rankings),
+            'num_constraints': A_eq.shape[0],
+            'nnz': A_eq.nnz,
+        }
         return res.success, res.x, res.fun
 
     def _unbiasedness_constraints(self, lists, rankings):
@@ -143,19 +301,32 @@ class Optimized(InterleavingMethod):
         In other words,
             sum_{L_i} {p_i} * sum^k_{j=1}
                 (ranking.credits[x][d_j] - ranking.credits[x+1][d_j]) = 0
+
+        Return a sparse matrix of shape
+        ((len(lists) - 1) * max_length, len(rankings)),
+        in which row x * max_length + k corresponds to team x and rank k.
         '''
-        result = []
-        credits = np.zeros((self.max_length, len(rankings), len(lists)))
+        num_pairs = len(lists) - 1
+        rows, cols, data = [], [], []
         for rid, ranking in enumerate(rankings):
-            for idx, docid in enumerate(ranking):
-                for team in ranking.credits:
-                    credits[idx, rid, team] = ranking.credits[team][docid]
-                    if idx > 0:
-                        credits[idx, rid, team] += credits[idx-1, rid, team]
-        for i in range(len(lists) - 1):
-            result.append(credits[:, :, i] - credits[:, :, i+1])
-        result = np.vstack(result)
-        return result
+            if len(ranking) == 0:
+                continue
+            length = min(len(ranking), self.max_length)
+            credits = np.array([[ranking.credits[team].get(docid, 0.0)
+                for team in range(len(lists))]
+                for docid in ranking[:length]])
+            credits = np.cumsum(credits, axis=0)
+            # diff[k, x] = credits of team x - credits of team x+1 at rank k
+            diff = credits[:, :-1] - credits[:, 1:]
+            ks, xs = np.nonzero(diff)
+            rows.append(xs * self.max_length + ks)
+            cols.append(np.full(len(ks), rid))
+            data.append(diff[ks, xs])
+        shape = (num_pairs * self.max_length, len(rankings))
+        if len(data) == 0:
+            return sparse.csr_matrix(shape)
+        return sparse.csr_matrix((np.concatenate(data),
+            (np.concatenate(rows), np.concatenate(cols))), shape=shape)
 
     def _sensitivity(self, lists, rankings):
         '''
@@ -195,3 +366,33 @@ class Optimized(InterleavingMethod):
         '''
         return {i: sum([ranking.credits[i][ranking[c]] for c in clicks])
             for i in ranking.credits}
+
+    @classmethod
+    def compute_scores_batch(cls, rankings, clicks_list):
+        '''
+        rankings: a list of instances of CreditRanking or CompactRanking
+        clicks_list: a list of lists of indices clicked by users
+
+        Return an array of shape (len(rankings), # of rankers)
+        storing the score of each ranker in each impression.
+        '''
+        uniques, slots, impressions, positions\
+            = cls._flatten_clicks(rankings, clicks_list)
+        num_rankers = max([len(r.credits) for r in uniques], default=0)
+        max_length = max([len(r) for r in uniques], default=0)
+        credits = np.zeros((len(uniques), num_rankers, max_length))
+        for u, ranking in enumerate(uniques):
+            if isinstance(ranking, CompactRanking):
+                credits[u, :, :len(ranking)] = np.nan_to_num(ranking.credits)
+            else:
+                for team, team_credits in ranking.credits.items():
+                    credits[u, team, :len(ranking)]\
+                        = [team_credits.get(docid, 0.0) for docid in ranking]
+
+        # clicked_credits[c, i]: credit for ranker i of the c-th click
+        clicked_credits = credits[slots[impressions], :, positions]
+        result = np.zeros((len(rankings), num_rankers))
+        for i in range(num_rankers):
+            result[:, i] = np.bincount(impressions,
+                weights=clicked_credits[:, i], minlength=len(rankings))
+        return result
@@ -0,0 +1,150 @@
+import numpy as np
+from scipy.stats import binom
+from scipy.stats import norm
+
+
+class OutcomeAggregator(object):
+    '''
+    Incremental aggregation of interleaving outcomes.
+    Only O(num_rankers ** 2) statistics are kept,
+    and thus per-impression outcomes need not be stored.
+
+    Args:
+        num_rankers: the number of rankers
+
+    Attributes:
+        count:   the number of impressions
+        wins:    wins[i, j] is the number of impressions in which
+                 ranker i won ranker j
+        ties:    ties[i, j] is the number of impressions in which
+                 ranker i and ranker j tied
+        sums:    sums[i, j] is the sum of score differences s_i - s_j
+        squares: squares[i, j] is the sum of (s_i - s_j) ** 2
+    '''
+
+    def __init__(self, num_rankers):
+        '''
+        num_rankers: the number of rankers
+        '''
+        self.num_rankers = num_rankers
+        self.count = 0
+        self.wins = np.zeros((num_rankers, num_rankers), dtype=int)
+        self.ties = np.zeros((num_rankers, num_rankers), dtype=int)
+        self.sums = np.zeros((num_rankers, num_rankers))
+        self.squares = np.zeros((num_rankers, num_rankers))
+
+    @property
+    def losses(self):
+        '''
+        losses[i, j] is the number of impressions in which ranker i lost
+        ranker j
+        '''
+        return self.wins.T
+
+    def add(self, scores):
+        '''
+        Add the scores of an impression
+
+        scores: a list (or a dict of ranker indices) of scores of each ranker
+                returned by `compute_scores`
+        '''
+        row = [scores[i] for i in range(self.num_rankers)]
+        self.add_batch(np.array([row], dtype=float))
+
+    def add_batch(self, scores, chunk_size=4096):
+        '''
+        Add the scores of impressions
+
+        scores: an array of shape (# of impressions, num_rankers)
+                returned by `compute_scores_batch` or `evaluate_batch`
+        chunk_size: the number of impressions processed at once
+        '''
+        scores = np.asarray(scores, dtype=float)
+        for start in range(0, len(scores), chunk_size):
+            s = scores[start:start+chunk_size]
+            diff = s[:, :, np.newaxis] - s[:, np.newaxis, :]
+            self._update(len(s), np.sum(diff > 0, axis=0),
+                np.sum(diff == 0, axis=0), np.sum(diff, axis=0),
+                np.sum(diff ** 2, axis=0))
+
+    def add_outcome(self, outcome):
+        '''
+        Add the outcome of an impression
+
+        outcome: a list of pairs of ranker indices returned by `evaluate`,
+                 in which (i, j) indicates i won j.
+                 Since scores are unknown, score differences are taken as
+                 1 (win), 0 (tie), and -1 (loss).
+        '''
+        diff = np.zeros((self.num_rankers, self.num_rankers))
+        for i, j in outcome:
+            diff[i, j] = 1.0
+            diff[j, i] = -1.0
+        self._update(1, diff > 0, diff == 0, diff, diff ** 2)
+
+    def _update(self, count, wins, ties, sums, squares):
+        self.count += count
+        self.wins += wins
+        self.ties += ties
+        np.fill_diagonal(self.ties, 0)
+        self.sums += sums
+        self.squares += squares
+
+    def merge(self, other):
+        '''
+        Merge statistics of another instance of OutcomeAggregator
+        (e.g. aggregated in another process) into this instance
+        '''
+        if other.num_rankers != self.num_rankers:
+            raise ValueError('The numbers of rankers are different')
+        self._update(other.count, other.wins, other.ties,
+            other.sums, other.squares)
+        return self
+
+    def preference_matrix(self):
+        '''
+        Return P where P[i, j] = (# of wins + 0.5 * # of ties) / # of impressions
+        of ranker i against ranker j
+        (0.5 for all pairs if no impression has been added)
+        '''
+        if self.count == 0:
+            return np.full((self.num_rankers, self.num_rankers), 0.5)
+        result = (self.wins + 0.5 * self.ties) / self.count
+        np.fill_diagonal(result, 0.5)
+        return result
+
+    def mean_differences(self):
+        '''
+        Return D where D[i, j] is the mean of score differences s_i - s_j
+        '''
+        if self.count == 0:
+            return np.zeros((self.num_rankers, self.num_rankers))
+        return self.sums / self.count
+
+    def confidence_intervals(self, alpha=0.05):
+        '''
+        Return a pair of arrays (lower, upper) of the confidence interval
+        of the mean score difference s_i - s_j for each (i, j),
+        based on the normal approximation with the sample variance
+
+        alpha: significance level (default: 0.05)
+        '''
+        mean = self.mean_differences()
+        if self.count < 2:
+            return (np.full(mean.shape, -np.inf), np.full(mean.shape, np.inf))
+        var = (self.squares - self.count * mean ** 2) / (self.count - 1)
+        stderr = np.sqrt(np.maximum(var, 0.0) / self.count)
+        z = norm.ppf(1.0 - alpha / 2)
+        return (mean - z * stderr, mean + z * stderr)
+
+    def p_values(self):
+        '''
+        Return an array of p-values of the two-sided sign test for each
+        pair of rankers, where ties are ignored
+        '''
+        wins, losses = self.wins, self.losses
+        result = 2 * binom.cdf(np.minimum(wins, losses), wins + losses, 0.5)
+        result = np.minimum(result, 1.0)
+        result[wins + losses == 0] = 1.0
+        np.fill_diagonal(result, 1.0)
+        return result
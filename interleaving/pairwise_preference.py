@@ -6,67 +6,190 @@ class PairwisePreference(InterleavingMethod):
     '''
     Pairwise Preference Multileaving
     '''
-    def _sample(self, max_length, lists):
+    def _sample(self, max_length, lists, uniforms=None):
         '''
         Sample a ranking
 
         max_length: the maximum length of resultant interleaving
         lists: lists of document IDs
+        uniforms: random numbers in [0, 1) used for sampling
+                  (at least max_length numbers).
+                  If this is None (default), they are drawn here.
 
         Return an instance of PairwisePreferenceRanking
+
+        Candidates at each rank are
+        { documents at a higher rank than the focused rank in any rankings }
+        - { selected documents },
+        which are kept in a pool updated incrementally:
+        documents appearing at the focused rank are appended to the pool,
+        and the selected document is removed by swapping it with the last one.
         '''
+        if uniforms is None:
+            uniforms = self.random_state.random(max_length)
         result = PairwisePreferenceRanking(lists)
+        result.rank_index = self._get_rank_index(lists, self.rank_index)
 
-        while len(result) < max_length:
-            focused_rank = len(result)
-            candidates = self._current_candidates(lists, focused_rank, result)
+        candidates = []
+        for focused_rank, arrivals in enumerate(
+            self._arrivals(max_length, lists)):
+            candidates += arrivals
             if not candidates:
                 break
 
             # pairwise preference just performs uniform sampling from candidates
-            sampled_index = np.random.randint(len(candidates))
+            sampled_index = int(uniforms[focused_rank] * len(candidates))
             result.append(candidates[sampled_index])
+            candidates[sampled_index] = candidates[-1]
+            candidates.pop()
 
         return result
 
-    def _current_candidates(self, lists, focused_rank, selected_documents):
-        """
-        Candidates = { documents at a higher rank than `focused_rank` in any rankings  }
-                     - { selected documents }
-        """
-        candidates = set()
-        for l in lists:
-            candidates.update(l[:focused_rank+1]) # documents at a higher rank
+    def _sample_many(self, n, max_length, lists):
+        '''
+        Sample `n` rankings with random numbers drawn at once.
 
-        candidates -= set(selected_documents) # exclude the selected documents
-        return list(candidates)
+        Since the same documents arrive at each rank in every ranking,
+        the size of the pool at each rank is common to all the rankings,
+        and thus the pools can be updated for all the rankings at once.
+        The result is the same as that of `_sample` with the same random
+        numbers.
+        '''
+        uniforms = self.random_state.random((n, max_length))
+        arrivals = self._arrivals(max_length, lists)
+        docs = [doc for docs in arrivals for doc in docs]
+        pools = np.empty((n, len(docs)), dtype=int)
+        samples = np.empty((n, max_length), dtype=int)
+        rows = np.arange(n)
+        num_arrived = 0
+        size = 0
+        length = 0
+        for focused_rank in range(max_length):
+            num_new = len(arrivals[focused_rank])
+            pools[:, size:size+num_new]\
+                = np.arange(num_arrived, num_arrived + num_new)
+            num_arrived += num_new
+            size += num_new
+            if size == 0:
+                break
+            sampled_indices = (uniforms[:, focused_rank] * size).astype(int)
+            samples[:, focused_rank] = pools[rows, sampled_indices]
+            pools[rows, sampled_indices] = pools[:, size-1]
+            size -= 1
+            length += 1
+
+        rank_index = self._get_rank_index(lists, self.rank_index)
+        result = []
+        for sample in samples[:, :length]:
+            ranking = PairwisePreferenceRanking(lists,
+                [docs[i] for i in sample])
+            ranking.rank_index = rank_index
+            result.append(ranking)
+        return result
+
+    def _arrivals(self, max_length, lists):
+        '''
+        Return a list whose i-th element is a list of documents
+        at rank i in any rankings but not at a higher rank
+        (i.e. documents that become candidates at rank i)
+        '''
+        result = []
+        seen = set()
+        for rank in range(max_length):
+            arrivals = []
+            for l in lists:
+                if rank < len(l) and not l[rank] in seen:
+                    seen.add(l[rank])
+                    arrivals.append(l[rank])
+            result.append(arrivals)
+        return result
 
     @classmethod
     def compute_scores(cls, ranking, clicks):
-        scores = {i: 0.0 for i in range(len(ranking.lists))}
-        preferences = cls._find_preferences(ranking, clicks)
-        for sup, inf in preferences:
-            r_under = cls._find_highest_rank_for_ranking(ranking, sup, inf)
-            r_above = cls._find_highest_rank_for_all(ranking.lists, sup, inf)
-            if r_under < r_above:
-                # skip unless r_under >= r_above
-                continue
-
-            w = cls._compute_probability(r_above, ranking.lists, sup, inf)
-            for i, r in enumerate(ranking.lists):
-                sup_rank = cls._get_rank(r, sup)
-                inf_rank = cls._get_rank(r, inf)
-                if sup_rank < inf_rank: # sup >_r inf
-                    scores[i] += 1 / w
-                elif sup_rank > inf_rank: # sup <_r inf
-                    scores[i] -= 1 / w
-        return scores
+        '''
+        ranking: an instance of PairwisePreferenceRanking
+        clicks: a list of indices clicked by a user
+
+        Return a list of scores of each ranker.
+
+        The ranks of displayed documents and the sizes of candidate sets
+        at each depth are computed once per ranking,
+        so that the weight and ranker signs of each preference are
+        obtained by lookups (see `_preference_weights`).
+        Ranks are looked up by the RankIndex of the ranking
+        (built here if the ranking does not have it).
+        '''
+        num_rankers = len(ranking.lists)
+        preferences = cls._find_preference_positions(ranking, clicks)
+        if len(preferences) == 0:
+            return {i: 0.0 for i in range(num_rankers)}
+        index = cls._get_rank_index(ranking.lists,
+            getattr(ranking, 'rank_index', None))
+        sup, inf = np.array(preferences, dtype=int).T
+
+        # r_under = min_{d} r(d, ranking)
+        positions = {}
+        for position, doc in enumerate(ranking):
+            positions.setdefault(doc, position)
+        first = np.array([positions[doc] for doc in ranking], dtype=int)
+        r_under = np.minimum(first[sup], first[inf])
+        # r_above = max_{d} min_{r} r(d, r)
+        ranks = index.rank_matrix(ranking)
+        highest = np.min(ranks, axis=1)
+        r_above = np.maximum(highest[sup], highest[inf])
+        # skip unless r_under >= r_above
+        is_valid = r_under >= r_above
+        min_x = np.minimum(highest[sup], highest[inf])[is_valid]
+        r_above = r_above[is_valid]
+        # signs[p, i] = 1 if sup >_i inf, -1 if sup <_i inf, and 0 otherwise
+        signs = np.sign(ranks[inf[is_valid]] - ranks[sup[is_valid]])
+
+        w, is_zero = cls._preference_weights(index.prefix_sizes, min_x, r_above)
+        if np.any(is_zero & np.any(signs != 0, axis=1)):
+            raise ZeroDivisionError('float division by zero')
+        w[is_zero] = 1.0
+        scores = np.sum(signs / w[:, np.newaxis], axis=0)
+        return {i: float(scores[i]) for i in range(num_rankers)}
+
+    @classmethod
+    def _preference_weights(cls, prefix_sizes, min_x, r_above):
+        '''
+        Compute `_compute_probability` for many preferences at once
+
+        prefix_sizes: the sizes of candidate sets at each depth
+                      (see RankIndex.prefix_sizes)
+        min_x: an array of min_{d} min_{r} r(d, r) of each preference
+        r_above: an array of max_{d} min_{r} r(d, r) of each preference
+
+        Return a pair of an array of weights and a boolean array
+        indicating preferences whose weight is zero (or undefined).
+        The weight is the product of factors 1 - 1 / (|C_x| - x)
+        for x in [min_x, r_above), which is obtained from
+        prefix sums of the logarithms of the factors.
+        '''
+        x = np.arange(len(prefix_sizes) - 1)
+        denominators = prefix_sizes[1:] - x
+        is_undefined = np.isin(denominators, [0, 1])
+        factors = 1 - 1 / np.where(is_undefined, 2, denominators)
+        log_sums = np.concatenate([[0.0], np.cumsum(np.log(factors))])
+        undefined_counts = np.concatenate([[0], np.cumsum(is_undefined)])
+        weights = np.exp(log_sums[r_above] - log_sums[min_x])
+        is_zero = undefined_counts[r_above] - undefined_counts[min_x] > 0
+        return weights, is_zero
 
     @classmethod
     def _find_preferences(cls, ranking, clicks):
         """
         Returns [(d_i, d_j)] where d_i is preferred to d_j
         """
+        return [(ranking[sup], ranking[inf])
+            for sup, inf in cls._find_preference_positions(ranking, clicks)]
+
+    @classmethod
+    def _find_preference_positions(cls, ranking, clicks):
+        """
+        Returns [(i, j)] where the document at i is preferred to that at j
+        """
         result = []
         if not clicks:
             # no preference if no click
@@ -74,20 +197,18 @@ class PairwisePreference(InterleavingMethod):
 
         clicked_docs = {ranking[click] for click in clicks}
         for click in clicks:
-            inferior_docs = []
+            inferior_positions = []
             # a clicked document > documents ranked above it but not clicked
-            above_unclicked = [doc for doc in ranking[:click]
-                               if not doc in clicked_docs]
-            inferior_docs += above_unclicked
+            above_unclicked = [position for position in range(click)
+                               if not ranking[position] in clicked_docs]
+            inferior_positions += above_unclicked
 
             # a clicked document > a document ranked next to it but not clicked
             if click+1 < len(ranking):
-                next_doc = ranking[click+1]
-                if not next_doc in clicked_docs:
-                    inferior_docs.append(next_doc)
+                if not ranking[click+1] in clicked_docs:
+                    inferior_positions.append(click+1)
 
-            clicked_doc = ranking[click]
-            result += [(clicked_doc, doc) for doc in inferior_docs]
+            result += [(click, position) for position in inferior_positions]
 
         return result
 
@@ -1,5 +1,7 @@
 from .ranking import ProbabilisticRanking
 from .interleaving_method import InterleavingMethod
+from .rng import check_random_state
+from functools import partial
 import numpy as np
 import scipy.special as special
 
@@ -24,26 +26,71 @@ class Probabilistic(InterleavingMethod):
                           Otherwise, they are sampled without replacement,
                           e.g. given two rankings A and B, one of them is
                           sampled first and then another is used.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
     '''
     class Softmax(object):
+        '''
+        Softmax function over a ranking, from which documents are sampled
+        and deleted.
+
+        Numerators are kept in a Fenwick (binary indexed) tree so that
+        both `sample` and `delete` take O(log n) time.
+
+        Args:
+            tau: a parameter that determines the probability of documents
+            ranking: a list of document IDs
+            random_state: a seed, an instance of numpy.random.Generator, or
+                          an instance of numpy.random.RandomState
+                          (the global random state of NumPy if None)
+        '''
 
-        def __init__(self, tau, ranking):
+        def __init__(self, tau, ranking, random_state=None):
+            self.random_state = check_random_state(random_state)
             self.tau = tau
             self.ranking = ranking
-            self.numerators = 1.0 / np.array(range(1, len(ranking)+1)) ** tau
+            self.numerators = 1.0 / np.arange(1, len(ranking)+1) ** tau
             self.doc_index = {docid: r for r, docid in enumerate(ranking)}
             self.denominator = np.sum(self.numerators)
             self._original_denominator = self.denominator
-            self._non_zero_index = set(range(len(self.numerators)))
+            self._weights = np.copy(self.numerators)
+            self._original_tree = self._build_tree(self.numerators)
+            self._tree = np.copy(self._original_tree)
+            self._step = 1 << (len(self.numerators).bit_length() - 1)\
+                if len(self.numerators) > 0 else 0
+            self._num_non_zero = len(self.numerators)
+
+        @staticmethod
+        def _build_tree(values):
+            '''
+            Build a Fenwick tree (1-origin) of values in O(n)
+            '''
+            tree = np.zeros(len(values) + 1)
+            tree[1:] = values
+            for i in range(1, len(tree)):
+                j = i + (i & -i)
+                if j < len(tree):
+                    tree[j] += tree[i]
+            return tree
 
         def delete(self, docid):
             if docid not in self.doc_index:
                 return 0.0
-            old_denominator = self.denominator
             idx = self.doc_index[docid]
+            if self._weights[idx] == 0:
+                # already deleted
+                return 0.0
+            old_denominator = self.denominator
             numerator = self.numerators[idx]
             self.denominator -= numerator
-            self._non_zero_index.remove(idx)
+            self._weights[idx] = 0.0
+            self._num_non_zero -= 1
+            i = idx + 1
+            while i < len(self._tree):
+                self._tree[i] -= numerator
+                i += i & -i
             if not self.denominator > 0:
                 self.denominator = 0
             # Returns probability of sampling docid before deletion
@@ -54,26 +101,85 @@ class Probabilistic(InterleavingMethod):
 
         def reset(self):
             self.denominator = self._original_denominator
-            self._non_zero_index = set(range(len(self.numerators)))
+            self._weights[:] = self.numerators
+            self._tree[:] = self._original_tree
+            self._num_non_zero = len(self.numerators)
 
         def sample(self):
-            if self.denominator == 0:
+            if self.denominator == 0 or self._num_non_zero == 0:
                 return None
-            p = np.random.rand() * self.denominator
-            cum = 0.0
-            for i in self._non_zero_index:
-                cum += self.numerators[i]
-                if cum > p:
-                    return self.ranking[i]
-            return self.ranking[i]
+            p = self.random_state.random() * self.denominator
+            # find the smallest index whose prefix sum exceeds p
+            idx = 0
+            step = self._step
+            while step > 0:
+                nxt = idx + step
+                if nxt < len(self._tree) and self._tree[nxt] <= p:
+                    idx = nxt
+                    p -= self._tree[nxt]
+                step >>= 1
+            if idx >= len(self._weights) or self._weights[idx] == 0:
+                # rounding errors in the tree: fall back to the last
+                # document that has not been deleted
+                idx = np.flatnonzero(self._weights)[-1]
+            return self.ranking[idx]
+
+        def sample_many(self, size, excluded=None):
+            '''
+            Sample `size` documents independently
+
+            size: the number of samples
+            excluded: a boolean array of shape (size, len(ranking)).
+                      excluded[i, r] indicates that the document at rank r
+                      cannot be sampled in the i-th sample,
+                      in addition to the deleted documents.
+
+            Return an array of ranks (indices of `ranking`) of the sampled
+            documents, where -1 indicates that no document is available.
+            '''
+            weights = np.broadcast_to(self._weights, (size, len(self._weights)))
+            if excluded is not None:
+                weights = np.where(excluded, 0.0, weights)
+            cum = np.cumsum(weights, axis=1)
+            if cum.shape[1] == 0:
+                return np.full(size, -1, dtype=int)
+            totals = cum[:, -1]
+            p = self.random_state.random(size) * totals
+            result = np.sum(cum <= p[:, np.newaxis], axis=1)
+            # guard against rounding errors at the upper end
+            result = np.minimum(result, len(self._weights) - 1)
+            last = len(self._weights) - 1 - np.argmax(weights[:, ::-1] > 0, axis=1)
+            result = np.where(weights[np.arange(size), result] > 0, result, last)
+            result[totals <= 0] = -1
+            return result
 
     class ProbablisticScore(dict):
-        __slots__ = ['allocations']
+        '''
+        Scores of rankers with `allocations` and `standard_errors`.
+        `allocations` can be given as a function building them,
+        which is called when `allocations` is first accessed.
+        '''
+        __slots__ = ['_allocations', '_allocations_builder', 'standard_errors']
         def __init__(self, *args, **kwargs):
             self.update(*args, **kwargs)
+            self._allocations = None
+            self._allocations_builder = None
+            self.standard_errors = None
+
+        @property
+        def allocations(self):
+            if self._allocations_builder is not None:
+                self._allocations = self._allocations_builder()
+                self._allocations_builder = None
+            return self._allocations
+
+        @allocations.setter
+        def allocations(self, value):
+            self._allocations = value
+            self._allocations_builder = None
 
     def __init__(self, lists, max_length=None, sample_num=None,
-        tau=3.0, replace=True):
+        tau=3.0, replace=True, random_state=None):
         '''
         lists: two lists of document IDs
         max_length: the maximum length of resultant interleaving.
@@ -90,13 +196,25 @@ class Probabilistic(InterleavingMethod):
                           Otherwise, they are sampled without replacement,
                           e.g. given two rankings A and B, one of them is
                           sampled first and then another is used.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for sampling.
+                      If this is None (default), the global random state
+                      of NumPy is used.
         '''
+        self.random_state = check_random_state(random_state)
         self._softmaxs = {}
         self._replace = replace
         for i, l in enumerate(lists):
-            self._softmaxs[i] = self.Softmax(tau, l)
+            self._softmaxs[i] = self.Softmax(tau, l,
+                random_state=self.random_state)
         super(Probabilistic, self).__init__(lists,
-            max_length=max_length, sample_num=sample_num)
+            max_length=max_length, sample_num=sample_num,
+            random_state=self.random_state)
+
+    def set_random_state(self, random_state):
+        super(Probabilistic, self).set_random_state(random_state)
+        for softmax in self._softmaxs.values():
+            softmax.random_state = self.random_state
 
     def _sample(self, max_length, lists):
         '''
@@ -114,9 +232,9 @@ class Probabilistic(InterleavingMethod):
         while len(result) < max_length and len(ranker_indices) > 0:
             if len(available_rankers) == 0:
                 available_rankers = list(ranker_indices)
-                np.random.shuffle(available_rankers)
+                self.random_state.shuffle(available_rankers)
             if self._replace:
-                ranker_idx = np.random.choice(available_rankers)
+                ranker_idx = self.random_state.choice(available_rankers)
             else:
                 ranker_idx = available_rankers.pop()
             docid = self._softmaxs[ranker_idx].sample()
@@ -135,44 +253,128 @@ class Probabilistic(InterleavingMethod):
 
         return result
 
+    def _sample_many(self, n, max_length, lists):
+        '''
+        Sample `n` rankings at once
+
+        The rankings are built position by position,
+        and the random numbers for all the rankings are drawn as arrays
+        at each position.
+        '''
+        num_rankers = len(lists)
+        docids = {}
+        list_ids = [np.array([docids.setdefault(d, len(docids)) for d in l],
+            dtype=int) for l in lists]
+        results = [ProbabilisticRanking(lists) for _ in range(n)]
+        lengths = np.zeros(n, dtype=int)
+        placed = np.zeros((n, len(docids)), dtype=bool)
+        alive = np.ones((n, num_rankers), dtype=bool)
+        # Rankers available for sampling without replacement.
+        # The available ranker with the largest key is used first.
+        available = np.zeros((n, num_rankers), dtype=bool)
+        keys = np.zeros((n, num_rankers))
+        rows = np.arange(n)
+
+        while True:
+            active = rows[(lengths < max_length) & alive.any(axis=1)]
+            if len(active) == 0:
+                break
+            if self._replace:
+                # a ranker is uniformly chosen from the remaining ones
+                counts = alive[active].sum(axis=1)
+                targets = (self.random_state.random(len(active)) * counts)\
+                    .astype(int)
+                cum = np.cumsum(alive[active], axis=1)
+                selected = np.argmax(cum > targets[:, np.newaxis], axis=1)
+            else:
+                # refill with shuffled rankers
+                empty = active[~available[active].any(axis=1)]
+                available[empty] = alive[empty]
+                keys[empty] = self.random_state.random((len(empty), num_rankers))
+                selected = np.argmax(
+                    np.where(available[active], keys[active], -1.0), axis=1)
+                available[active, selected] = False
+
+            for j in range(num_rankers):
+                targets = active[selected == j]
+                if len(targets) == 0:
+                    continue
+                ranks = self._softmaxs[j].sample_many(len(targets),
+                    excluded=placed[targets][:, list_ids[j]])
+                exhausted = targets[ranks < 0]
+                alive[exhausted, j] = False
+                # rankers are used in the original order after exhaustion
+                available[exhausted] = alive[exhausted]
+                keys[exhausted] = np.arange(num_rankers)
+                targets, ranks = targets[ranks >= 0], ranks[ranks >= 0]
+                placed[targets, list_ids[j][ranks]] = True
+                lengths[targets] += 1
+                for i, r in zip(targets, ranks):
+                    results[i].append(lists[j][r])
+
+        return results
+
     @classmethod
-    def compute_scores(cls, ranking, clicks, tau=3.0, n=10**4):
+    def compute_scores(cls, ranking, clicks, tau=3.0, n=10**4,
+        engine='dp', allocations=False, random_state=None):
         '''
         ranking: an instance of Ranking
         clicks: a list of indices clicked by a user
+        n: the budget of sampling, i.e. the number of samples of the
+           'sample' engine for two rankers, or a parameter that determines
+           the number of assignments kept for more than two rankers
+        engine: algorithm used for two rankers.
+                'dp' (default) computes the exact scores by dynamic
+                programming in polynomial time.
+                'enumerate' enumerates all the 2 ** len(ranking) assignments
+                and is kept as a reference implementation.
+                'sample' estimates the scores by sampling `n` assignments
+                in O(n * len(clicks)) time, and returns their standard errors
+                as `standard_errors` (None for the other engines).
+        allocations: if True, the 'dp' and 'sample' engines also return the
+                     (estimated) probability of each pair of click counts
+                     (c_0, c_1) as `allocations`
+                     (otherwise, `allocations` is None).
+                     The 'enumerate' engine always returns the probability
+                     of each assignment.
+                     For more than two rankers, the click counts and
+                     probability of each assignment kept in the beam are
+                     returned, which are built when `allocations` is
+                     first accessed.
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState used by the
+                      'sample' engine and for more than two rankers.
+                      If this is None (default), the global random state
+                      of NumPy is used.
 
         Return a list of scores of each ranker.
         '''
         L = ranking
         C = {ranking[index] for index in clicks}
+        random_state = check_random_state(random_state)
         if len(ranking.lists) == 2:
-            # [Hofmann+, CIKM 2011] (Computationally expensive)
-            o = cls.ProbablisticScore({0: 0.0, 1: 0.0})
-            o.allocations = {}
-            for i in range(2 ** len(ranking)):
-                a = []
-                for d in L:
-                    a.append(i % 2)
-                    i //= 2
-                c = [0, 0]
-                R = [cls.Softmax(tau, R_j) for R_j in ranking.lists]
-                cum_p = 1.0
-                for j, d in zip(a, L):
-                    j_alter = (j + 1) % 2
-                    if d in C:
-                        c[j] += 1
-                    cum_p *= R[j].delete(d)
-                    R[j_alter].delete(d)
-                if c[0] < c[1]:
-                    o[1] += cum_p
-                elif c[1] < c[0]:
-                    o[0] += cum_p
-                o.allocations[tuple(a)] = (c, cum_p)
-            return o
+            if engine == 'dp':
+                return cls._compute_scores_dp(ranking, C, tau, allocations)
+            elif engine == 'enumerate':
+                return cls._compute_scores_enumerate(ranking, C, tau)
+            elif engine == 'sample':
+                return cls._compute_scores_sample(ranking, C, tau, n,
+                    allocations, random_state)
+            else:
+                raise ValueError(
+                    'engine should be either dp, enumerate, or sample')
         if 2 < len(ranking.lists):
             # [Schuth+, SIGIR 2015]
+            # The beam is kept as arrays: outcomes[i] and log_probs[i] are
+            # the click counts and log probability of the i-th assignment,
+            # and levels[l] = (parents, rankers) indicates that
+            # the i-th assignment at level l extends the parents[i]-th one
+            # at the previous level by assigning the l-th document to
+            # rankers[i].
             R = [cls.Softmax(tau, R_j) for R_j in ranking.lists]
-            A_prime = [(np.zeros(len(R)), 0.0, [])]
+            outcomes = np.zeros((1, len(R)))
+            log_probs = np.zeros(1)
+            levels = []
             threshold = 1 / len(R) * n ** (1 / len(L))
             for d in L:
                 # Break if no click
@@ -185,40 +387,163 @@ class Probabilistic(InterleavingMethod):
 
                 # Compute the document probability
                 # Only keep non-zero rankers
-                P = np.zeros(len(R))
-                R_non_zero = []
-                for j, R_j in enumerate(R):
-                    P[j] = R_j.delete(d)
-                    if P[j] > 0.0:
-                        R_non_zero.append((j, R_j))
+                P = np.array([R_j.delete(d) for R_j in R])
+                R_non_zero = np.flatnonzero(P > 0.0)
                 if len(R_non_zero) == 0:
                     break
 
-                A, A_prime = A_prime, []
-                is_pass = np.random.rand(len(A), len(R_non_zero)) <= threshold
-                for i, (o, p, a) in enumerate(A):
-                    # Skip some assignments with certain probability
-                    R_used = [R_non_zero[k]
-                        for k in range(len(R_non_zero)) if is_pass[i][k]]
-                    for j, R_j in R_used:
-                        p_prime = p + np.log(P[j])
-                        o_prime = np.copy(o)
-                        if d_in_C:
-                            o_prime[j] += 1
-                        A_prime.append((o_prime, p_prime, a + [j]))
+                # Skip some assignments with certain probability
+                is_pass = random_state.random(
+                    (len(log_probs), len(R_non_zero))) <= threshold
+                parents, columns = np.nonzero(is_pass)
+                rankers = R_non_zero[columns]
+                outcomes = outcomes[parents]
+                if d_in_C:
+                    outcomes[np.arange(len(parents)), rankers] += 1
+                log_probs = log_probs[parents] + np.log(P[rankers])
+                levels.append((parents, rankers))
 
             o = np.zeros(len(R))
-            allocations = {}
-            if len(A_prime) > 0:
+            p_all = np.zeros(0)
+            if len(log_probs) > 0:
                 # Use logsumexp to avoid over-flow
-                p_log_all = np.array([p_prime for _, p_prime, _ in A_prime])
-                p_all = np.exp(p_log_all - special.logsumexp(p_log_all))
-                for i, (o_prime, _, a) in enumerate(A_prime):
-                    p_prime = p_all[i]
-                    o += o_prime * p_prime
-                    allocations[tuple(a)] = (list(o_prime), p_prime)
+                p_all = np.exp(log_probs - special.logsumexp(log_probs))
+                o = p_all @ outcomes
             result = cls.ProbablisticScore({i: o[i] for i in range(len(R))})
-            result.allocations = allocations
+            result._allocations_builder = partial(
+                cls._allocations_from_beam, outcomes, p_all, levels)
             return result
         else:
             raise ValueError('Invalid number of original lists')
+
+    @classmethod
+    def _allocations_from_beam(cls, outcomes, probs, levels):
+        '''
+        Return a dict of each assignment in the beam
+        and a pair of its click counts and probability,
+        where assignments are traced back from parent pointers in `levels`
+        '''
+        assignments = np.empty((len(outcomes), len(levels)), dtype=int)
+        indices = np.arange(len(outcomes))
+        for l in reversed(range(len(levels))):
+            parents, rankers = levels[l]
+            assignments[:, l] = rankers[indices]
+            indices = parents[indices]
+        return {tuple(a): (list(o), p)
+            for a, o, p in zip(assignments.tolist(), outcomes, probs)}
+
+    @classmethod
+    def _compute_scores_enumerate(cls, ranking, C, tau):
+        '''
+        [Hofmann+, CIKM 2011] (Computationally expensive)
+        Enumerate all the assignments of documents to the two rankers.
+        '''
+        L = ranking
+        o = cls.ProbablisticScore({0: 0.0, 1: 0.0})
+        o.allocations = {}
+        for i in range(2 ** len(ranking)):
+            a = []
+            for d in L:
+                a.append(i % 2)
+                i //= 2
+            c = [0, 0]
+            R = [cls.Softmax(tau, R_j) for R_j in ranking.lists]
+            cum_p = 1.0
+            for j, d in zip(a, L):
+                j_alter = (j + 1) % 2
+                if d in C:
+                    c[j] += 1
+                cum_p *= R[j].delete(d)
+                R[j_alter].delete(d)
+            if c[0] < c[1]:
+                o[1] += cum_p
+            elif c[1] < c[0]:
+                o[0] += cum_p
+            o.allocations[tuple(a)] = (c, cum_p)
+        return o
+
+    @classmethod
+    def _compute_scores_dp(cls, ranking, C, tau, allocations=False):
+        '''
+        Exact computation of the scores of [Hofmann+, CIKM 2011]
+        by dynamic programming over (position, c_0 - c_1).
+
+        Every document in the ranking is deleted from both softmax functions
+        regardless of the assignment, so that the remaining softmax mass at
+        each position does not depend on the assignment.
+        The probability of an assignment is therefore a product of
+        per-position factors, and it suffices to keep the probability mass of
+        each difference of click counts: O(len(ranking) ** 2) in total.
+        '''
+        R = [cls.Softmax(tau, R_j) for R_j in ranking.lists]
+        size = len(ranking)
+        # probs[size + c_0 - c_1]: probability mass of the difference
+        probs = np.zeros(2 * size + 1)
+        probs[size] = 1.0
+        num_clicks = 0
+        for d in ranking:
+            p_0 = R[0].delete(d)
+            p_1 = R[1].delete(d)
+            if d in C:
+                num_clicks += 1
+                shifted = np.zeros(len(probs))
+                shifted[1:] += probs[:-1] * p_0
+                shifted[:-1] += probs[1:] * p_1
+                probs = shifted
+            else:
+                probs *= p_0 + p_1
+
+        o = cls.ProbablisticScore({
+            0: np.sum(probs[size+1:]),
+            1: np.sum(probs[:size]),
+        })
+        if allocations:
+            o.allocations = {}
+            for diff in range(-num_clicks, num_clicks + 1, 2):
+                c_0 = (num_clicks + diff) // 2
+                o.allocations[(c_0, num_clicks - c_0)] = probs[size + diff]
+        else:
+            o.allocations = None
+        return o
+
+    @classmethod
+    def _compute_scores_sample(cls, ranking, C, tau, n, allocations=False,
+        random_state=None):
+        '''
+        Monte Carlo estimation of the scores of [Hofmann+, CIKM 2011]
+        with `n` samples.
+
+        As in `_compute_scores_dp`, the probability of an assignment is
+        a product of per-position factors. Thus, the scores are
+        Z * Pr(c_0 > c_1) and Z * Pr(c_1 > c_0), where
+        Z is the product of p_0 + p_1 over positions and each clicked
+        document is independently assigned to ranker 0
+        with probability p_0 / (p_0 + p_1).
+        '''
+        if n < 1:
+            raise ValueError('n must be positive')
+        random_state = check_random_state(random_state)
+        R = [cls.Softmax(tau, R_j) for R_j in ranking.lists]
+        z = 1.0
+        q = []
+        for d in ranking:
+            p_0 = R[0].delete(d)
+            p_1 = R[1].delete(d)
+            z *= p_0 + p_1
+            if d in C:
+                q.append(p_0 / (p_0 + p_1) if p_0 + p_1 > 0 else 0.0)
+
+        # c_0[s]: the number of clicks assigned to ranker 0 in the s-th sample
+        c_0 = np.sum(random_state.random((n, len(q))) < np.array(q), axis=1)
+        diffs = 2 * c_0 - len(q)
+        wins = {0: np.mean(diffs > 0), 1: np.mean(diffs < 0)}
+        o = cls.ProbablisticScore({i: z * wins[i] for i in wins})
+        o.standard_errors = {i: z * np.sqrt(wins[i] * (1 - wins[i]) / n)
+            for i in wins}
+        if allocations:
+            counts = np.bincount(c_0, minlength=len(q) + 1)
+            o.allocations = {(c, len(q) - c): z * counts[c] / n
+                for c in range(len(q) + 1)}
+        else:
+            o.allocations = None
+        return o
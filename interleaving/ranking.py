@@ -1,11 +1,13 @@
 from collections import defaultdict
+import numpy as np
 
 class BalancedRanking(list):
     '''
     A list of document IDs generated by an interleaving method
     including two rankers A and B
+    (and a RankIndex of them as `rank_index` if set by the method)
     '''
-    __slots__ = ['a', 'b']
+    __slots__ = ['a', 'b', 'rank_index']
     def __hash__(self):
         return hash((tuple(self), tuple(self.a), tuple(self.b)))
 
@@ -63,8 +65,11 @@ class ListsRanking(list):
     Args:
         lists:    list of original document ID lists
         contents: initial list of document IDs (optional)
+
+    Attributes:
+        rank_index: a RankIndex of the lists (None if not set by the method)
     '''
-    __slots__ = ['lists']
+    __slots__ = ['lists', 'rank_index']
     def __init__(self, lists, contents=[]):
         '''
         Initialize self.teams
@@ -74,6 +79,7 @@ class ListsRanking(list):
         '''
         self += contents
         self.lists = lists
+        self.rank_index = None
 
     def __hash__(self):
         l = []
@@ -132,3 +138,259 @@ class TeamRanking(list):
 
 class PairwisePreferenceRanking(ListsRanking):
     pass
+
+class CompactRanking(object):
+    '''
+    A compact representation of a ranking generated by an interleaving
+    method, in which document IDs are replaced with their indices in a
+    Vocabulary of the method.
+    CompactRanking is created and converted back by Vocabulary.
+
+    Args:
+        ranking_class: the class of the original ranking
+        docs:          an integer array of document indices
+        teams:         an integer array of the team of each document
+                       (-1 for no team), or None
+        credits:       a float array of shape (num_rankers, len(docs)),
+                       where NaN indicates no credit, or None
+    '''
+    __slots__ = ['ranking_class', 'docs', 'teams', 'credits', '_hash']
+    def __init__(self, ranking_class, docs, teams=None, credits=None):
+        '''
+        ranking_class: the class of the original ranking
+        docs:          an integer array of document indices
+        teams:         an integer array of the team of each document
+                       (-1 for no team), or None
+        credits:       a float array of shape (num_rankers, len(docs)),
+                       where NaN indicates no credit, or None
+        '''
+        self.ranking_class = ranking_class
+        self.docs = docs
+        self.teams = teams
+        self.credits = credits
+        self._hash = None
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _key(self):
+        return (self.ranking_class.__name__, self.docs.tobytes(),
+            None if self.teams is None else self.teams.tobytes(),
+            None if self.credits is None else self.credits.tobytes())
+
+    def __hash__(self):
+        '''
+        The hash value is computed only once
+        '''
+        if self._hash is None:
+            self._hash = hash(self._key())
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactRanking):
+            return NotImplemented
+        return hash(self) == hash(other) and self._key() == other._key()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+
+class Vocabulary(object):
+    '''
+    A vocabulary of document IDs in lists given to an interleaving method,
+    by which rankings are converted to and from CompactRanking
+
+    Args:
+        lists: lists of document IDs
+    '''
+    def __init__(self, lists):
+        '''
+        lists: lists of document IDs
+        '''
+        self.lists = lists
+        self.ids = {}
+        for l in lists:
+            for docid in l:
+                if not docid in self.ids:
+                    self.ids[docid] = len(self.ids)
+        self.docids = list(self.ids)
+        self.dtype = np.min_scalar_type(max(len(self.ids) - 1, 0))
+        self.team_dtype = np.min_scalar_type(-len(lists))
+
+    def __len__(self):
+        return len(self.docids)
+
+    def encode(self, docids):
+        '''
+        Return an integer array of the indices of document IDs
+        '''
+        try:
+            return np.array([self.ids[d] for d in docids], dtype=self.dtype)
+        except KeyError as e:
+            raise ValueError('Unknown document ID: %s' % e)
+
+    def decode(self, indices):
+        '''
+        Return a list of document IDs of the indices
+        '''
+        return [self.docids[i] for i in indices]
+
+    def compact(self, ranking):
+        '''
+        Convert a ranking into an instance of CompactRanking
+        '''
+        docs = self.encode(ranking)
+        teams = None
+        credits = None
+        if isinstance(ranking, TeamRanking):
+            if set(ranking.teams) != set(range(len(self.lists))):
+                raise ValueError('Teams do not match the lists')
+            positions = {docid: idx for idx, docid in enumerate(ranking)}
+            teams = np.full(len(ranking), -1, dtype=self.team_dtype)
+            for team, members in ranking.teams.items():
+                for docid in members:
+                    idx = positions.get(docid)
+                    if idx is None or teams[idx] >= 0:
+                        raise ValueError('Teams cannot be represented')
+                    teams[idx] = team
+        elif isinstance(ranking, CreditRanking):
+            if set(ranking.credits) != set(range(len(self.lists))):
+                raise ValueError('Credits do not match the lists')
+            positions = {docid: idx for idx, docid in enumerate(ranking)}
+            credits = np.full((len(self.lists), len(ranking)), np.nan)
+            for team, team_credits in ranking.credits.items():
+                for docid, credit in team_credits.items():
+                    if not docid in positions:
+                        raise ValueError('Credits cannot be represented')
+                    credits[team, positions[docid]] = credit
+        elif isinstance(ranking, BalancedRanking):
+            if [ranking.a, ranking.b] != list(self.lists):
+                raise ValueError('Lists do not match the vocabulary')
+        elif isinstance(ranking, ListsRanking):
+            if list(ranking.lists) != list(self.lists):
+                raise ValueError('Lists do not match the vocabulary')
+        else:
+            raise ValueError('Unknown ranking type: %s' % type(ranking))
+        return CompactRanking(type(ranking), docs, teams=teams,
+            credits=credits)
+
+    def expand(self, compact):
+        '''
+        Convert an instance of CompactRanking into the original ranking
+        '''
+        contents = self.decode(compact.docs)
+        cls = compact.ranking_class
+        if issubclass(cls, TeamRanking):
+            result = cls(range(len(self.lists)), contents)
+            for docid, team in zip(contents, compact.teams):
+                if team >= 0:
+                    result.teams[int(team)].add(docid)
+        elif issubclass(cls, CreditRanking):
+            result = cls(len(self.lists), contents)
+            for team in range(len(self.lists)):
+                for docid, credit in zip(contents, compact.credits[team]):
+                    if not np.isnan(credit):
+                        result.credits[team][docid] = float(credit)
+        elif issubclass(cls, BalancedRanking):
+            result = cls(contents)
+            result.a = self.lists[0]
+            result.b = self.lists[1]
+        elif issubclass(cls, ListsRanking):
+            result = cls(self.lists, contents)
+        else:
+            raise ValueError('Unknown ranking type: %s' % cls)
+        return result
+
+
+class RankIndex(object):
+    '''
+    An index of the rank of each document in each of lists given to an
+    interleaving method, by which the rank is looked up in O(1)
+    instead of `list.index`.
+    The rank of a document not in a list is the length of the list,
+    and the rank of a duplicated document is that of its first occurrence.
+
+    Args:
+        lists: lists of document IDs
+    '''
+    def __init__(self, lists):
+        '''
+        lists: lists of document IDs
+        '''
+        self.lists = lists
+        self.lengths = tuple([len(l) for l in lists])
+        ranks = {}
+        for i, l in enumerate(lists):
+            for rank, docid in enumerate(l):
+                if not docid in ranks:
+                    ranks[docid] = list(self.lengths)
+                if ranks[docid][i] == self.lengths[i]:
+                    ranks[docid][i] = rank
+        self._ranks = {docid: tuple(r) for docid, r in ranks.items()}
+        self._prefix_sizes = None
+
+    def __len__(self):
+        return len(self._ranks)
+
+    def __contains__(self, docid):
+        return docid in self._ranks
+
+    def is_built_from(self, lists):
+        '''
+        Return True if this index is built from the same list objects
+        '''
+        return len(lists) == len(self.lists)\
+            and all([l is m for l, m in zip(lists, self.lists)])
+
+    def rank(self, i, docid):
+        '''
+        Return the rank of a document in the i-th list
+        '''
+        ranks = self._ranks.get(docid)
+        if ranks is None:
+            return self.lengths[i]
+        return ranks[i]
+
+    def ranks(self, docid):
+        '''
+        Return a tuple of the ranks of a document in the lists
+        '''
+        return self._ranks.get(docid, self.lengths)
+
+    def is_within(self, i, docid, k):
+        '''
+        Return True if a document is in the top k+1 documents of the i-th list
+        (i.e. `docid in lists[i][:k+1]`)
+        '''
+        rank = self.rank(i, docid)
+        return rank < self.lengths[i] and rank <= k
+
+    def rank_matrix(self, docids):
+        '''
+        Return an integer array of shape (len(docids), # of lists)
+        storing the rank of each document in each list
+        '''
+        result = np.empty((len(docids), len(self.lists)), dtype=int)
+        for idx, docid in enumerate(docids):
+            result[idx] = self.ranks(docid)
+        return result
+
+    @property
+    def prefix_sizes(self):
+        '''
+        An integer array whose d-th element is the number of distinct
+        documents in the top d documents of any list
+        (computed when it is first accessed)
+        '''
+        if self._prefix_sizes is None:
+            max_length = max(self.lengths, default=0)
+            result = np.zeros(max_length + 1, dtype=int)
+            docs = set()
+            for d in range(max_length):
+                docs.update([l[d] for l in self.lists if d < len(l)])
+                result[d+1] = len(docs)
+            self._prefix_sizes = result
+        return self._prefix_sizes
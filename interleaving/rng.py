@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def check_random_state(random_state=None):
+    '''
+    Return a random number generator for `random_state`.
+    Only `random`, `choice`, and `shuffle` of the result are used in this
+    library, which behave in the same way for both numpy.random.Generator
+    and numpy.random.RandomState.
+
+    random_state: None (default) for the global random state of NumPy
+                  (i.e. the one seeded by `np.random.seed`),
+                  an integer seed for a new numpy.random.Generator,
+                  or an instance of numpy.random.Generator or
+                  numpy.random.RandomState, which is returned as it is.
+    '''
+    if random_state is None:
+        return np.random.mtrand._rand
+    if isinstance(random_state, (np.random.Generator, np.random.RandomState)):
+        return random_state
+    if isinstance(random_state, (int, np.integer)):
+        return np.random.default_rng(random_state)
+    raise ValueError('%r cannot be used as a random state' % (random_state,))
+
+
+def spawn(random_state, n):
+    '''
+    Return a list of `n` independent instances of numpy.random.Generator
+    derived from `random_state`, e.g. for worker processes.
+    The result is determined by `random_state`, so that runs with
+    the same seed are reproducible regardless of the scheduling of workers.
+
+    random_state: None, an integer seed, or an instance of
+                  numpy.random.Generator or numpy.random.RandomState
+                  (see `check_random_state`)
+    n: the number of generators
+    '''
+    random_state = check_random_state(random_state)
+    if isinstance(random_state, np.random.Generator):
+        return random_state.spawn(n)
+    # RandomState cannot be spawned, so that a seed is drawn from it
+    seed_sequence = np.random.SeedSequence(
+        random_state.randint(2 ** 32, size=4, dtype=np.uint64))
+    return [np.random.default_rng(s) for s in seed_sequence.spawn(n)]
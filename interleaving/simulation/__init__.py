@@ -1,3 +1,8 @@
 from .simulator import Simulator
 from .ranker import Ranker
+from .ranker import MatrixRanker
+from .ranker import LinearRanker
 from .user import User
+from .dataset import Dataset
+from .dataset import DocumentView
+from .experiment import Experiment
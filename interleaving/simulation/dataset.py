@@ -0,0 +1,284 @@
+import hashlib
+import json
+import numpy as np
+import os
+import scipy.sparse as sparse
+import shutil
+import tempfile
+
+
+class DocumentView(object):
+    '''
+    A view of a document (a row) in Dataset,
+    which can be used in place of Document, e.g. by Ranker.
+    The feature dict is built when it is first accessed.
+    '''
+    __slots__ = ['dataset', 'row', '_features']
+
+    def __init__(self, dataset, row):
+        '''
+        dataset: an instance of Dataset
+        row: the row index of the document in the dataset
+        '''
+        self.dataset = dataset
+        self.row = row
+        self._features = None
+
+    @property
+    def rel(self):
+        return int(self.dataset.rels[self.row])
+
+    @property
+    def qid(self):
+        return self.dataset.qid_of(self.row)
+
+    @property
+    def features(self):
+        '''
+        A dict of { feature: value } as Document.features
+        '''
+        if self._features is None:
+            features = self.dataset.features
+            start, end = features.indptr[self.row], features.indptr[self.row+1]
+            self._features = dict(zip(features.indices[start:end].tolist(),
+                features.data[start:end].tolist()))
+        return self._features
+
+
+class Dataset(object):
+    '''
+    A learning to rank dataset stored in columnar arrays,
+    in which documents of the same query are stored in consecutive rows
+    in the order of the first appearance of the query.
+
+    Args:
+        features: a CSR matrix of shape (# of documents, max feature + 1),
+                  where explicit zeros in the files are kept
+        rels: an integer array of relevance grades
+        qids: a list of query IDs
+        offsets: an integer array of length len(qids) + 1.
+                 Documents of qids[i] are rows in [offsets[i], offsets[i+1]).
+    '''
+
+    def __init__(self, features, rels, qids, offsets):
+        '''
+        features: a CSR matrix of shape (# of documents, max feature + 1),
+                  where explicit zeros in the files are kept
+        rels: an integer array of relevance grades
+        qids: a list of query IDs
+        offsets: an integer array of length len(qids) + 1.
+                 Documents of qids[i] are rows in [offsets[i], offsets[i+1]).
+        '''
+        self.features = features
+        self.rels = rels
+        self.qids = qids
+        self.offsets = offsets
+        self.qid_index = {qid: i for i, qid in enumerate(qids)}
+
+    # arrays stored in a binary cache
+    _CACHED_ARRAYS = ['data', 'indices', 'indptr', 'rels', 'offsets']
+
+    @classmethod
+    def load(cls, filepaths, cache_dir=None):
+        '''
+        Load files in the LETOR (SVMlight) format (see `parse`)
+
+        filepaths: paths to the files
+        cache_dir: a directory of binary caches (optional).
+                   If a cache of the files is found there,
+                   its arrays are memory-mapped instead of parsing the files,
+                   so that processes loading the same files share the same
+                   pages. Otherwise, the files are parsed and cached.
+                   A cache is used only if the size and modification time
+                   (or SHA-1 hash) of every file are the same as when it was
+                   written.
+        '''
+        if cache_dir is None:
+            return cls.parse(filepaths)
+        path = os.path.join(cache_dir, cls._cache_key(filepaths))
+        result = cls._load_cache(path, filepaths)
+        if result is None:
+            result = cls.parse(filepaths)
+            result._save_cache(path, filepaths)
+        return result
+
+    @classmethod
+    def parse(cls, filepaths):
+        '''
+        Parse files in the LETOR (SVMlight) format shown below:
+            <line>    .=. <target> qid:<qid> <feature>:<value> <feature>:<value> ... <feature>:<value> # <info>
+            <target>  .=. <positive integer>
+            <qid>     .=. <positive integer>
+            <feature> .=. <positive integer>
+            <value>   .=. <float>
+            <info>    .=. <string>
+
+        Only the relevance grade and query ID are split from each line here,
+        and all the features are parsed into arrays at once.
+        '''
+        rels = []
+        qids = []
+        counts = []
+        pairs = []
+        for filepath in filepaths:
+            with open(filepath) as f:
+                for line in f:
+                    tokens = line.split('#', 1)[0].split(None, 2)
+                    if len(tokens) == 0:
+                        continue
+                    rels.append(tokens[0])
+                    qids.append(tokens[1].split(':', 1)[1])
+                    if len(tokens) > 2:
+                        counts.append(tokens[2].count(':'))
+                        pairs.append(tokens[2])
+                    else:
+                        counts.append(0)
+
+        values = np.fromstring(' '.join(pairs).replace(':', ' '),
+            dtype=float, sep=' ').reshape((-1, 2))
+        indices = values[:, 0].astype(int)
+        indptr = np.concatenate([[0], np.cumsum(counts, dtype=int)])
+        features = sparse.csr_matrix((values[:, 1], indices, indptr),
+            shape=(len(rels), np.max(indices, initial=0) + 1))
+        rels = np.array(rels, dtype=int)
+
+        # group documents by query in the order of the first appearance
+        codes = {}
+        query_indices = np.array([codes.setdefault(q, len(codes))
+            for q in qids], dtype=int)
+        if np.any(np.diff(query_indices) < 0):
+            order = np.argsort(query_indices, kind='stable')
+            features = features[order]
+            rels = rels[order]
+            query_indices = query_indices[order]
+        offsets = np.concatenate([[0],
+            np.cumsum(np.bincount(query_indices, minlength=len(codes)))])
+        return cls(features, rels, list(codes), offsets)
+
+    @staticmethod
+    def _cache_key(filepaths):
+        paths = [os.path.abspath(p) for p in filepaths]
+        s = json.dumps(paths, separators=(',', ':'))
+        return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _sha1(filepath):
+        result = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                result.update(chunk)
+        return result.hexdigest()
+
+    @classmethod
+    def _sources(cls, filepaths):
+        '''
+        Return a list of the path, size, modification time, and hash
+        of each file, which is stored in the header of a cache
+        '''
+        result = []
+        for filepath in filepaths:
+            stat = os.stat(filepath)
+            result.append({
+                'path': os.path.abspath(filepath),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha1': cls._sha1(filepath),
+            })
+        return result
+
+    @classmethod
+    def _is_fresh(cls, sources, filepaths):
+        '''
+        Return True if the files are the same as `sources` in a header.
+        The hash is computed only if the modification time is different.
+        '''
+        if len(sources) != len(filepaths):
+            return False
+        for source, filepath in zip(sources, filepaths):
+            if not os.path.exists(filepath):
+                return False
+            stat = os.stat(filepath)
+            if stat.st_size != source['size']:
+                return False
+            if stat.st_mtime != source['mtime']\
+                and cls._sha1(filepath) != source['sha1']:
+                return False
+        return True
+
+    @classmethod
+    def _load_cache(cls, path, filepaths):
+        '''
+        Return a Dataset whose arrays are memory-mapped from a cache,
+        or None if the cache does not exist or is stale
+        '''
+        header_path = os.path.join(path, 'header.json')
+        if not os.path.exists(header_path):
+            return None
+        with open(header_path) as f:
+            header = json.load(f)
+        if not cls._is_fresh(header['sources'], filepaths):
+            return None
+        arrays = {name: np.load(os.path.join(path, name + '.npy'),
+            mmap_mode='r') for name in cls._CACHED_ARRAYS}
+        features = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(header['shape']), copy=False)
+        return cls(features, arrays['rels'], header['qids'],
+            arrays['offsets'])
+
+    def _save_cache(self, path, filepaths):
+        '''
+        Write the arrays and a header to a cache.
+        Files are written in a temporary directory first,
+        which is then renamed so that readers never see a partial cache.
+        '''
+        cache_dir = os.path.dirname(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=cache_dir, suffix='.tmp')
+        arrays = {
+            'data': self.features.data,
+            'indices': self.features.indices,
+            'indptr': self.features.indptr,
+            'rels': self.rels,
+            'offsets': self.offsets,
+        }
+        for name in self._CACHED_ARRAYS:
+            np.save(os.path.join(tmp, name + '.npy'), arrays[name])
+        header = {
+            'sources': self._sources(filepaths),
+            'shape': list(self.features.shape),
+            'qids': self.qids,
+        }
+        with open(os.path.join(tmp, 'header.json'), 'w') as f:
+            json.dump(header, f)
+        if os.path.exists(path):
+            # a stale cache
+            shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # another process has just written the cache
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def __len__(self):
+        return len(self.rels)
+
+    def rows(self, qid):
+        '''
+        Return a range of rows of documents of a query
+        '''
+        i = self.qid_index[qid]
+        return range(self.offsets[i], self.offsets[i+1])
+
+    def qid_of(self, row):
+        '''
+        Return the query ID of a row
+        '''
+        i = np.searchsorted(self.offsets, row, side='right') - 1
+        return self.qids[i]
+
+    def documents(self, qid):
+        '''
+        Return a list of DocumentView of a query
+        '''
+        return [DocumentView(self, row) for row in self.rows(qid)]
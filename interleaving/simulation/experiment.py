@@ -0,0 +1,132 @@
+from ..rng import spawn
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+
+
+# arguments of `Experiment.evaluate` shared with worker processes
+_shared = None
+
+
+def _init_worker(experiment, user):
+    '''
+    Keep the arguments in a worker process.
+    They are inherited without copying if the process is forked.
+    '''
+    global _shared
+    _shared = (experiment, user)
+
+
+def _evaluate_in_worker(args):
+    '''
+    Evaluate a shard of sampled queries with its own random stream
+    '''
+    queries, random_state = args
+    experiment, user = _shared
+    user.random_state = random_state
+    for q in set(queries):
+        # method instances are copies in this process
+        experiment.methods[q].set_random_state(random_state)
+    return experiment._evaluate_queries(queries, user)
+
+
+class Experiment(object):
+    '''
+    An interleaving experiment that compares rankers on a simulator.
+    A method instance is built for each query when the query is first
+    sampled, and reused in later calls of `evaluate`,
+    e.g. to compare the same rankers under different users.
+
+    Args:
+        simulator: an instance of Simulator
+        rankers: instances of Ranker to be compared
+        method: a class of intereaving method used in the simulation
+        **kwargs: keyword arguments of `method` (e.g. sample_num)
+    '''
+
+    def __init__(self, simulator, rankers, method, **kwargs):
+        '''
+        simulator: an instance of Simulator
+        rankers: instances of Ranker to be compared
+        method: a class of intereaving method used in the simulation
+        **kwargs: keyword arguments of `method` (e.g. sample_num)
+        '''
+        self.simulator = simulator
+        self.rankers = rankers
+        self.method = method
+        self.kwargs = kwargs
+        self.methods = {}
+
+    def method_of(self, qid):
+        '''
+        Return the method instance of a query, which is built
+        from the ranked lists of the rankers if it does not exist
+        '''
+        if not qid in self.methods:
+            sim = self.simulator
+            num_docs = len(sim.dataset.rows(qid))
+            topk = sim.topk if sim.topk <= num_docs else num_docs
+            ranked_lists = [sim._ranked_list(r, qid) for r in self.rankers]
+            self.methods[qid] = self.method(ranked_lists, max_length=topk,
+                random_state=sim.random_state, **self.kwargs)
+        return self.methods[qid]
+
+    def evaluate(self, user):
+        '''
+        Args:
+            user: an instance of User that is assumed in the simulation
+
+        Returns:
+            Return a list of dicts storing the score of each ranker.
+
+        Queries are sampled by the random state of the simulator.
+        If `n_jobs` of the simulator is more than 1, the sampled queries are
+        split into `n_jobs` shards evaluated in worker processes,
+        each of which uses its own random stream spawned from `random_state`
+        for both interleaving and the user.
+        The results are concatenated in the order of the shards, and thus
+        determined by `random_state` and `n_jobs`.
+        '''
+        sim = self.simulator
+        queries = sim.random_state.choice(list(sim.dataset.qids),
+            sim.query_sample_num, replace=True)
+        # method instances are built before workers are forked
+        for q in queries:
+            self.method_of(q)
+        if sim.n_jobs is not None and sim.n_jobs > 1:
+            return self._evaluate_in_parallel(queries, user)
+        return self._evaluate_queries(queries, user)
+
+    def _evaluate_queries(self, queries, user):
+        '''
+        Evaluate the sampled queries in the current process
+        '''
+        result = []
+        for q in queries:
+            rels = self.simulator._rels(q)
+            ranking = self.methods[q].interleave()
+            clicks = user.examine(ranking, rels)
+            res = self.method.evaluate(ranking, clicks)
+            result.append(res)
+        return result
+
+    def _evaluate_in_parallel(self, queries, user):
+        '''
+        Evaluate shards of the sampled queries in `n_jobs` worker processes.
+        Workers are forked if possible, so that the dataset and method
+        instances are shared without copying.
+        '''
+        n_jobs = self.simulator.n_jobs
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+        shards = np.array_split(queries, n_jobs)
+        tasks = list(zip(shards,
+            spawn(self.simulator.random_state, len(shards))))
+        result = []
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context,
+            initializer=_init_worker, initargs=(self, user)) as executor:
+            for res in executor.map(_evaluate_in_worker, tasks):
+                result += res
+        return result
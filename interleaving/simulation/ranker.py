@@ -1,3 +1,33 @@
+import numpy as np
+import scipy.sparse as sparse
+
+
+def argsort_scores(scores):
+    '''
+    Return indices that sort scores in the descending order.
+    Documents with the same score keep their original order
+    as `sorted(..., reverse=True)` does.
+    '''
+    return np.argsort(-np.asarray(scores), kind='stable')
+
+
+def feature_matrix(documents):
+    '''
+    Return a CSR matrix of features of documents
+    (instances of Document or DocumentView)
+    '''
+    indptr = [0]
+    indices = []
+    data = []
+    for d in documents:
+        indices += d.features.keys()
+        data += d.features.values()
+        indptr.append(len(indices))
+    num_features = max(indices, default=0) + 1
+    return sparse.csr_matrix((data, indices, indptr),
+        shape=(len(documents), num_features))
+
+
 class Ranker(object):
     '''
     A ranker that sorts documents by their features.
@@ -22,3 +52,88 @@ class Ranker(object):
             key=lambda x: self.scorer(x.features),
             reverse=True)
         return result
+
+    def score(self, features):
+        '''
+        Args:
+            features: a CSR matrix of features of documents
+
+        Returns:
+            an array of scores of the documents.
+            The feature dict of each document is passed to `scorer`.
+        '''
+        result = np.empty(features.shape[0])
+        for row in range(features.shape[0]):
+            start, end = features.indptr[row], features.indptr[row+1]
+            result[row] = self.scorer(dict(zip(
+                features.indices[start:end].tolist(),
+                features.data[start:end].tolist())))
+        return result
+
+    def score_dataset(self, dataset):
+        '''
+        Args:
+            dataset: an instance of Dataset
+
+        Returns:
+            an array of scores of all the documents in the dataset
+        '''
+        return self.score(dataset.features)
+
+
+class MatrixRanker(Ranker):
+    '''
+    A ranker whose scorer takes a feature matrix of documents of a query.
+
+    Args:
+        scorer: a function that takes a CSR matrix of features of documents
+                (rows) and returns an array of their scores
+    '''
+    def rank(self, documents):
+        '''
+        Args:
+            documents: a list of instances of Document or DocumentView
+
+        Returns:
+            a ranked list of the documents sorted
+            by the descending order of their scores.
+        '''
+        order = argsort_scores(self.score(feature_matrix(documents)))
+        return [documents[i] for i in order]
+
+    def score(self, features):
+        return np.asarray(self.scorer(features), dtype=float)
+
+    def score_dataset(self, dataset):
+        '''
+        Scores are computed query by query,
+        since the scorer may depend on the other documents of the query
+        '''
+        result = np.empty(len(dataset))
+        for start, end in zip(dataset.offsets[:-1], dataset.offsets[1:]):
+            result[start:end] = self.score(dataset.features[start:end])
+        return result
+
+
+class LinearRanker(MatrixRanker):
+    '''
+    A ranker that scores documents by a weighted sum of their features.
+
+    Args:
+        weights: an array of weights, where weights[f] is the weight of
+                 feature f (features beyond its length are ignored)
+    '''
+    def __init__(self, weights):
+        self.weights = np.asarray(weights, dtype=float)
+        super(LinearRanker, self).__init__(self._dot)
+
+    def _dot(self, features):
+        num_features = min(features.shape[1], len(self.weights))
+        return features[:, :num_features] @ self.weights[:num_features]
+
+    def score_dataset(self, dataset):
+        '''
+        Scores of all the documents are computed
+        by a single sparse matrix-vector product
+        '''
+        return self.score(dataset.features)
@@ -1,8 +1,13 @@
-from .document import Document
+from ..outcome_aggregator import OutcomeAggregator
+from ..rng import check_random_state
+from .dataset import Dataset
+from .experiment import Experiment
 from collections import defaultdict
 from .ndcg import ndcg
+from .ranker import argsort_scores
 import numpy as np
 
+
 class Simulator(object):
     '''
     A simulator based on a learning to rank dataset.
@@ -19,17 +24,81 @@ class Simulator(object):
             <info>    .=. <string>
         query_sample_num: the number of query samplings
         topk:             the number of documents shown to users in interleaving
+        random_state:     a seed, an instance of numpy.random.Generator, or
+                          an instance of numpy.random.RandomState
+                          for sampling queries and interleavings.
+                          If this is None (default), the global random state
+                          of NumPy is used.
+        n_jobs:           the number of worker processes for `evaluate`.
+                          If this is None (default), queries are evaluated
+                          in the current process.
+        cache_dir:        a directory of binary caches of datasets
+                          (optional). If given, parsed datasets are cached
+                          there and memory-mapped in later runs
+                          (see `Dataset.load`).
     '''
 
-    def __init__(self, dataset_filepaths, query_sample_num, topk=10):
-        self.docs = defaultdict(list)
-        for dataset_filepath in dataset_filepaths:
-            with open(dataset_filepath) as f:
-                for line in f:
-                    d = Document.readline(line)
-                    self.docs[d.qid].append(d)
+    def __init__(self, dataset_filepaths, query_sample_num, topk=10,
+        random_state=None, n_jobs=None, cache_dir=None):
+        self.dataset = Dataset.load(dataset_filepaths, cache_dir=cache_dir)
+        self._docs = None
         self.query_sample_num = query_sample_num
         self.topk = topk
+        self.random_state = check_random_state(random_state)
+        self.n_jobs = n_jobs
+        self._score_cache = {}
+        self._ranked_lists = {}
+
+    @property
+    def docs(self):
+        '''
+        A dict of lists of DocumentView for each query
+        (built when it is first accessed)
+        '''
+        if self._docs is None:
+            self._docs = {qid: self.dataset.documents(qid)
+                for qid in self.dataset.qids}
+        return self._docs
+
+    def _scores(self, ranker):
+        '''
+        Return an array of scores of all the documents given by a ranker
+        (see Ranker.score_dataset), which is cached for the ranker
+        '''
+        if not ranker in self._score_cache:
+            self._score_cache[ranker] = ranker.score_dataset(self.dataset)
+        return self._score_cache[ranker]
+
+    def _ranked_list(self, ranker, qid):
+        '''
+        Return a list of rows of documents of a query
+        sorted by the descending order of scores given by a ranker.
+        Rows in the dataset are used as document IDs in simulations.
+        Ranked lists are cached for each pair of a ranker and a query.
+        '''
+        key = (ranker, qid)
+        if not key in self._ranked_lists:
+            rows = self.dataset.rows(qid)
+            scores = self._scores(ranker)
+            order = argsort_scores(scores[rows.start:rows.stop])
+            self._ranked_lists[key] = (order + rows.start).tolist()
+        return self._ranked_lists[key]
+
+    def clear_cache(self):
+        '''
+        Clear scores and ranked lists cached for rankers,
+        which must be called if a ranker is modified (e.g. its weights)
+        '''
+        self._score_cache.clear()
+        self._ranked_lists.clear()
+
+    def _rels(self, qid):
+        '''
+        Return a dict of the relevance grade of each row of a query
+        '''
+        rows = self.dataset.rows(qid)
+        return dict(zip(rows,
+            self.dataset.rels[rows.start:rows.stop].tolist()))
 
     def ndcg(self, rankers, cutoff):
         '''
@@ -38,18 +107,30 @@ class Simulator(object):
             cutoff:  cutoff for nDCG
         '''
         result = defaultdict(list)
-        for q in self.docs:
-            documents = self.docs[q]
-            rels = {id(d): d.rel for d in documents}
-            for idx, ranker in enumerate(rankers):
-                res = ranker.rank(documents)
-                ranked_list = [id(d) for d in res]
+        for q in self.dataset.qids:
+            rels = self._rels(q)
+            for idx in range(len(rankers)):
+                ranked_list = self._ranked_list(rankers[idx], q)
                 score = ndcg(ranked_list, rels, cutoff)
                 result[idx].append(score)
         for idx in result:
             result[idx] = np.average(result[idx])
         return result
 
+    def experiment(self, rankers, method, **kwargs):
+        '''
+        Args:
+            rankers: instances of Ranker to be compared
+            method: a class of intereaving method used in the simulation
+            **kwargs: keyword arguments of `method` (e.g. sample_num)
+
+        Returns:
+            an instance of Experiment, which keeps method instances of
+            sampled queries so that they are reused in every call of
+            `Experiment.evaluate` (e.g. for different users).
+        '''
+        return Experiment(self, rankers, method, **kwargs)
+
     def evaluate(self, rankers, user, method):
         '''
         Args:
@@ -59,29 +140,12 @@ class Simulator(object):
 
         Returns:
             Return a list of dicts storing the score of each ranker.
+
+        Method instances are built for this call only.
+        Use `experiment` to reuse them across users.
+        See `Experiment.evaluate` for the use of `n_jobs`.
         '''
-        methods = {}
-        for q in self.docs:
-            documents = self.docs[q]
-            topk = self.topk if self.topk <= len(documents) else len(documents)
-            ranked_lists = []
-            for ranker in rankers:
-                res = ranker.rank(documents)
-                res = [id(d) for d in res]
-                ranked_lists.append(res)
-            methods[q] = method(ranked_lists, max_length=topk)
-
-        result = []
-        queries = np.random.choice(list(self.docs.keys()),
-            self.query_sample_num, replace=True)
-        for q in queries:
-            documents = self.docs[q]
-            rels = {id(d): d.rel for d in documents}
-            ranking = methods[q].interleave()
-            clicks = user.examine(ranking, rels)
-            res = method.evaluate(ranking, clicks)
-            result.append(res)
-        return result
+        return self.experiment(rankers, method).evaluate(user)
 
     @classmethod
     def measure_error(cls, il_result, ndcg_result):
@@ -91,11 +155,18 @@ class Simulator(object):
               / (# of rankers) * ((# of rankers) - 1),
               where P^_{i, j} = 1 (i won j) or 0 (j won i) in the interleaving,
               and P_{i, j} = 1 (i won j) or 0 (j won i) in terms fo nDCG.
+
+        il_result: a list of results of `evaluate`
+                   or an instance of OutcomeAggregator
         '''
         prefs = defaultdict(int)
-        for res in il_result:
-            for r in res:
-                prefs[r] += 1
+        if isinstance(il_result, OutcomeAggregator):
+            for (i, j), wins in np.ndenumerate(il_result.wins):
+                prefs[(i, j)] = wins
+        else:
+            for res in il_result:
+                for r in res:
+                    prefs[r] += 1
 
         result = 0.0
         for i in ndcg_result:
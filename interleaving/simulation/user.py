@@ -1,3 +1,4 @@
+from ..rng import check_random_state
 import numpy as np
 
 
@@ -8,15 +9,25 @@ class User(object):
     Args:
         click_probs: [p0, p1, ...]. pi is probability of clicking on grade i
         stop_probs: [p0, p1, ...]. pi is probability of stopping at grade i
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for clicks.
+                      If this is None (default), the global random state
+                      of NumPy is used.
     '''
 
-    def __init__(self, click_probs=[0, 1], stop_probs=[0, 0]):
+    def __init__(self, click_probs=[0, 1], stop_probs=[0, 0],
+        random_state=None):
         '''
         click_probs: [p0, p1, ...]. pi is probability of clicking on grade i
         stop_probs: [p0, p1, ...]. pi is probability of stopping at grade i
+        random_state: a seed, an instance of numpy.random.Generator, or
+                      an instance of numpy.random.RandomState for clicks.
+                      If this is None (default), the global random state
+                      of NumPy is used.
         '''
         self.click_probs = click_probs
         self.stop_probs = stop_probs
+        self.random_state = check_random_state(random_state)
 
     def examine(self, ranking, relevance):
         '''
@@ -32,8 +43,8 @@ class User(object):
             g = relevance.get(r, 0)
             stop_p = self.stop_probs[g]
             click_p = self.click_probs[g]
-            if np.random.rand() < click_p:
+            if self.random_state.random() < click_p:
                 clicks.append(idx)
-            if np.random.rand() < stop_p:
+            if self.random_state.random() < stop_p:
                 break
         return clicks
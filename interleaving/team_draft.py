@@ -1,3 +1,4 @@
+from .ranking import CompactRanking
 from .ranking import TeamRanking
 from .interleaving_method import InterleavingMethod
 import numpy as np
@@ -6,38 +7,85 @@ class TeamDraft(InterleavingMethod):
     '''
     Team Draft Interleaving
     '''
-    def _sample(self, max_length, lists):
+    def _sample(self, max_length, lists, uniforms=None):
         '''
         Sample a ranking
 
         max_length: the maximum length of resultant interleaving
         *lists: lists of document IDs
+        uniforms: random numbers in [0, 1) used for team selection
+                  (at least max_length + len(lists) numbers).
+                  If this is None (default), they are drawn here.
 
         Return an instance of TeamDraftRanking
+
+        Each ranker keeps a cursor to its first document that may not have
+        been placed yet, and placed documents are kept in a set.
+        Since a document once placed is never removed, skipped documents
+        need not be visited again, and thus each pick is amortized O(1).
+        The cursor always points to the first unplaced document of the list,
+        and the output is identical to that of scanning the whole list
+        for the same random numbers.
         '''
+        if uniforms is None:
+            uniforms = self.random_state.random(max_length + len(lists))
         result = TeamRanking(range(len(lists)))
         empty_teams = set()
+        placed = set()
+        cursors = [0] * len(lists)
 
+        step = 0
         while len(result) < max_length:
-            selected_team = self._select_team(result.teams, empty_teams)
+            selected_team = self._select_team(result.teams, empty_teams,
+                uniforms[step])
+            step += 1
             if selected_team is None:
                 break
-            docs = [x for x in lists[selected_team] if not x in result]
-            if len(docs) > 0:
-                selected_doc = docs[0]
+            selected_doc = self._next_doc(lists, selected_team,
+                cursors, placed)
+            if selected_doc is not None:
                 result.append(selected_doc)
+                placed.add(selected_doc)
                 result.teams[selected_team].add(selected_doc)
             else:
                 empty_teams.add(selected_team)
 
         return result
 
-    def _select_team(self, teams, empty_teams):
+    def _sample_many(self, n, max_length, lists):
+        '''
+        Sample `n` rankings with random numbers drawn at once
+        '''
+        uniforms = self.random_state.random((n, max_length + len(lists)))
+        return [self._sample(max_length, lists, u) for u in uniforms]
+
+    @staticmethod
+    def _next_doc(lists, team, cursors, placed):
+        '''
+        lists: lists of document IDs
+        team: a team index
+        cursors: a list of cursors of each team (advanced in place)
+        placed: a set of document IDs already placed
+
+        Return the first document of `lists[team]` not in `placed`,
+        or None if there is no such document
+        '''
+        docs = lists[team]
+        cursor = cursors[team]
+        while cursor < len(docs) and docs[cursor] in placed:
+            cursor += 1
+        cursors[team] = cursor
+        if cursor < len(docs):
+            return docs[cursor]
+        return None
+
+    def _select_team(self, teams, empty_teams, u=None):
         '''
         teams: a dict of team index and members (document IDs that belong to
                the team)
         empty_teams: a set of team indices that do not include available
                      documents
+        u: a random number in [0, 1) (drawn here if None)
 
         Return a selected team index
         '''
@@ -49,7 +97,9 @@ class TeamDraft(InterleavingMethod):
             if len(teams[i]) == min_team_num and not i in empty_teams]
         if len(available_teams) == 0:
             return None
-        selected_team = np.random.choice(available_teams)
+        if u is None:
+            u = self.random_state.random()
+        selected_team = available_teams[int(u * len(available_teams))]
         return selected_team
 
     @classmethod
@@ -62,3 +112,38 @@ class TeamDraft(InterleavingMethod):
         '''
         return {i: len([c for c in clicks if ranking[c] in ranking.teams[i]])
             for i in ranking.teams}
+
+    @classmethod
+    def compute_scores_batch(cls, rankings, clicks_list):
+        '''
+        rankings: a list of instances of TeamRanking or CompactRanking
+        clicks_list: a list of lists of indices clicked by users
+
+        Return an array of shape (len(rankings), # of rankers)
+        storing the score of each ranker in each impression.
+        The number of rankers of CompactRanking is inferred from its teams.
+        '''
+        uniques, slots, impressions, positions\
+            = cls._flatten_clicks(rankings, clicks_list)
+        num_rankers = 0
+        max_length = max([len(r) for r in uniques], default=0)
+        teams = np.full((len(uniques), max_length), -1, dtype=int)
+        for u, ranking in enumerate(uniques):
+            if isinstance(ranking, CompactRanking):
+                teams[u, :len(ranking)] = ranking.teams
+                num_rankers = max(num_rankers,
+                    int(np.max(ranking.teams, initial=-1)) + 1)
+            else:
+                doc_teams = {docid: team
+                    for team, members in ranking.teams.items()
+                    for docid in members}
+                teams[u, :len(ranking)]\
+                    = [doc_teams.get(docid, -1) for docid in ranking]
+                num_rankers = max(num_rankers, max(ranking.teams) + 1)
+
+        clicked_teams = teams[slots[impressions], positions]
+        is_valid = clicked_teams >= 0
+        counts = np.bincount(
+            impressions[is_valid] * num_rankers + clicked_teams[is_valid],
+            minlength=len(rankings) * num_rankers)
+        return counts.reshape((len(rankings), num_rankers)).astype(float)
@@ -0,0 +1,55 @@
+import interleaving as il
+import numpy as np
+import pytest
+from .test_methods import TestMethods
+
+class TestAliasTable(TestMethods):
+
+    def test_raise_value_error(self):
+        with pytest.raises(ValueError):
+            il.AliasTable([])
+        with pytest.raises(ValueError):
+            il.AliasTable([0.0, 0.0])
+        with pytest.raises(ValueError):
+            il.AliasTable([0.5, -0.5, 1.0])
+
+    def test_table(self):
+        probabilities = [0.1, 0.2, 0.3, 0.4]
+        table = il.AliasTable(probabilities)
+        assert len(table) == 4
+        # the probability of each index is recovered from the table
+        recovered = np.zeros(4)
+        for i in range(4):
+            recovered[i] += table.thresholds[i] / 4
+            recovered[table.aliases[i]] += (1 - table.thresholds[i]) / 4
+        for p, q in zip(probabilities, recovered):
+            self.assert_almost_equal(p, q, 1e-12)
+
+    def test_sample(self):
+        probabilities = [0.5, 0.0, 0.2, 0.3]
+        table = il.AliasTable(probabilities)
+        n = 20000
+        counts = np.zeros(4)
+        for i in range(n):
+            counts[table.sample()] += 1
+        assert counts[1] == 0
+        for p, c in zip(probabilities, counts):
+            self.assert_almost_equal(p, c / n)
+
+        counts = np.bincount(table.sample_many(n), minlength=4)
+        assert counts[1] == 0
+        for p, c in zip(probabilities, counts):
+            self.assert_almost_equal(p, c / n)
+
+    def test_unnormalized(self):
+        table = il.AliasTable([2, 6])
+        samples = table.sample_many(20000)
+        self.assert_almost_equal(np.mean(samples == 1), 0.75)
+
+    def test_method(self):
+        b = il.Balanced([[1, 2], [2, 3]], sample_num=100)
+        rankings, probabilities = zip(*b.ranking_distribution)
+        table = b.alias_table
+        assert len(table) == len(rankings)
+        assert rankings[table.sample()] in rankings
+        assert il.Balanced([[1, 2], [2, 3]]).alias_table is None
@@ -17,6 +17,16 @@ class TestBalanced(TestMethods):
         self.interleave(il.Balanced, [[1, 2], [2, 3]], 3, [(1, 2), (2, 1, 3)])
         self.interleave(il.Balanced, [[1, 2], [3, 4]], 3, [(1, 3, 2), (3, 1, 4)])
 
+    def test_interleave_many(self):
+        self.interleave_many(il.Balanced, [[1, 2], [2, 3]], 3,
+            [(1, 2), (2, 1, 3)])
+        self.interleave_many(il.Balanced, [[1, 2], [3, 4]], 3,
+            [(1, 3, 2), (3, 1, 4)])
+        rankings = il.Balanced([[1, 2], [3, 4]]).interleave_many(1000)
+        self.assert_almost_equal(
+            len([r for r in rankings if r[0] == 1]) / 1000, 0.5, 0.05)
+        assert all(r.a == [1, 2] and r.b == [3, 4] for r in rankings)
+
     def test_init_sampling(self):
         b = il.Balanced([[1, 2], [2, 3]], sample_num=1000)
         rankings, probabilities = zip(*b.ranking_distribution)
@@ -68,3 +78,26 @@ class TestBalanced(TestMethods):
         self.evaluate(il.Balanced, ranking, [1], [(0, 1)])
         self.evaluate(il.Balanced, ranking, [2], [(1, 0)])
         self.evaluate(il.Balanced, ranking, [], [])
+
+    def test_evaluate_with_rank_index(self):
+        b = il.Balanced([[1, 2, 3], [2, 4, 1]])
+        for ranking in b.interleave_many(10):
+            assert ranking.rank_index is b.rank_index
+            plain = BalancedRanking(ranking)
+            plain.a = ranking.a
+            plain.b = ranking.b
+            for clicks in [[0], [1], [2], [0, 2], [1, 2]]:
+                assert b.compute_scores(ranking, clicks)\
+                    == b.compute_scores(plain, clicks)
+
+    def test_evaluate_batch(self):
+        for lists in [[[1, 2, 3, 4], [2, 3, 5, 1]], [[1, 2, 3], [4, 5, 6]]]:
+            b = il.Balanced(lists, sample_num=10)
+            rankings = b.interleave_many(50)
+            self.evaluate_batch(il.Balanced, rankings,
+                self.random_clicks(rankings))
+        ranking = BalancedRanking([2, 1, 3])
+        ranking.a = [1, 2]
+        ranking.b = [2, 3]
+        self.evaluate_batch(il.Balanced, [ranking] * 8,
+            [[0, 1, 2], [0, 1], [0, 2], [1, 2], [0], [1], [2], []])
@@ -0,0 +1,81 @@
+import interleaving as il
+import numpy as np
+import os
+import pytest
+from .test_methods import TestMethods
+
+class TestDistributionCache(TestMethods):
+
+    def test_raise_value_error(self):
+        with pytest.raises(ValueError):
+            il.DistributionCache(max_entries=0)
+
+    def test_key(self):
+        key = il.DistributionCache.key
+        assert key('Optimized', [[1, 2], [2, 3]], 2, 3, 'inverse')\
+            == key('Optimized', [(1, 2), (2, 3)], 2, 3, 'inverse')
+        assert key('Optimized', [[1, 2], [2, 3]], 2, 3, 'inverse')\
+            != key('Optimized', [[1, 2], [2, 3]], 2, 3, 'negative')
+        assert key('Optimized', [[1, 2], [2, 3]], 2, 3, 'inverse')\
+            != key('RoughlyOptimized', [[1, 2], [2, 3]], 2, 3, 'inverse')
+
+    def test_lru(self):
+        cache = il.DistributionCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1
+        cache.put('c', 3)
+        assert len(cache) == 2
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+        assert 'a' in cache
+        assert cache.stats == {
+            'hits': 2, 'disk_hits': 0, 'misses': 1, 'entries': 2}
+        cache.clear()
+        assert cache.stats == {
+            'hits': 0, 'disk_hits': 0, 'misses': 0, 'entries': 0}
+
+    def test_disk(self, tmpdir):
+        directory = os.path.join(str(tmpdir), 'cache')
+        cache = il.DistributionCache(max_entries=1, directory=directory)
+        cache.put('a', [1, 2])
+        cache.put('b', [3])
+        assert len(cache) == 1
+        assert cache.get('a') == [1, 2]
+        assert cache.disk_hits == 1
+
+        other = il.DistributionCache(directory=directory)
+        assert 'b' in other
+        assert other.get('b') == [3]
+        assert other.get('c') is None
+        assert other.stats == {
+            'hits': 0, 'disk_hits': 1, 'misses': 1, 'entries': 1}
+
+    def test_optimized(self, tmpdir):
+        cache = il.DistributionCache(directory=str(tmpdir))
+        lists = [[1, 2], [2, 3]]
+        b1 = il.Optimized(lists, sample_num=3, cache=cache)
+        assert cache.misses == 1
+        b2 = il.Optimized(lists, sample_num=3, cache=cache)
+        assert cache.hits == 1
+        assert b2.solver_stats is None
+        assert b1._rankings == b2._rankings
+        assert list(b1._probabilities) == list(b2._probabilities)
+        assert tuple(b2.interleave()) in [(1, 2), (2, 1), (2, 3)]
+
+        il.Optimized(lists, sample_num=3, credit_func='negative', cache=cache)
+        il.RoughlyOptimized(lists, sample_num=3, cache=cache)
+        assert cache.misses == 3
+
+        b3 = il.Optimized(lists, sample_num=3,
+            cache=il.DistributionCache(directory=str(tmpdir)))
+        assert b3._rankings == b1._rankings
+        assert [r.credits for r in b3._rankings]\
+            == [r.credits for r in b1._rankings]
+
+    def test_optimized_parallel(self):
+        cache = il.DistributionCache()
+        lists = [[1, 2], [2, 3]]
+        il.Optimized(lists, sample_num=3, n_jobs=2, cache=cache)
+        il.Optimized(lists, sample_num=3, n_jobs=2, cache=cache)
+        assert cache.stats['hits'] == 1
@@ -20,7 +20,40 @@ class TestMethods(object):
         possible_results = set([tuple(i) for i in ideals])
         assert results == possible_results
 
+    def interleave_many(self, method, lists, k, ideals, num=100):
+        results = method(lists, max_length=k).interleave_many(num)
+        assert len(results) == num
+        results = set([tuple(res) for res in results])
+        possible_results = set([tuple(i) for i in ideals])
+        assert results == possible_results
+
     def evaluate(self, method, ranking, clicks, result):
         res = method.evaluate(ranking, clicks)
         assert set(res) == set(result)
 
+
+    def evaluate_batch(self, method, rankings, clicks_list):
+        scores, wins, ties = method.evaluate_batch(rankings, clicks_list,
+            chunk_size=7)
+        assert scores.shape[0] == len(rankings)
+        num_rankers = scores.shape[1]
+        ideal_wins = np.zeros((num_rankers, num_rankers), dtype=int)
+        for k, (ranking, clicks) in enumerate(zip(rankings, clicks_list)):
+            res = method.compute_scores(ranking, clicks)
+            for i in range(num_rankers):
+                self.assert_almost_equal(scores[k, i], res[i], 1e-10)
+            for i, j in method.evaluate(ranking, clicks):
+                ideal_wins[i, j] += 1
+        assert (wins == ideal_wins).all()
+        assert (ties == ties.T).all()
+        assert (np.diag(ties) == 0).all()
+        total = wins + wins.T + ties + np.eye(num_rankers, dtype=int) * len(rankings)
+        assert (total == len(rankings)).all()
+
+    def random_clicks(self, rankings):
+        result = []
+        for ranking in rankings:
+            num = np.random.randint(0, len(ranking) + 1)
+            result.append(list(np.random.choice(len(ranking), num,
+                replace=False)))
+        return result
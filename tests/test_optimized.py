@@ -3,6 +3,7 @@ from interleaving import CreditRanking
 import json
 import numpy as np
 import pytest
+import scipy.sparse as sparse
 from .test_methods import TestMethods
 
 class TestOptimized(TestMethods):
@@ -26,6 +27,26 @@ class TestOptimized(TestMethods):
         assert [[1, 2], [2, 1], [2, 3]] == sorted(b._rankings)
         assert [1.0 / 3] * 3 == list(b._probabilities)
 
+    def test_parallel_sampling(self):
+        b = il.Optimized([[1, 2], [2, 3]], sample_num=3, n_jobs=2)
+        assert [[1, 2], [2, 1], [2, 3]] == sorted(b._rankings)
+        self.assert_almost_equal(np.sum(b._probabilities), 1.0)
+
+        b = il.Optimized([[1, 2], [2, 3]], sample_num=1000,
+            secure_sampling=True, n_jobs=2)
+        b._sample_rankings()
+        assert [[1, 2], [2, 1], [2, 3]] == sorted(b._rankings)
+        assert [1.0 / 3] * 3 == list(b._probabilities)
+
+        lists = [[1, 2, 3, 4], [5, 6, 7, 8]]
+        np.random.seed(1)
+        b1 = il.Optimized(lists, sample_num=8, n_jobs=3)
+        np.random.seed(1)
+        b2 = il.Optimized(lists, sample_num=8, n_jobs=3)
+        assert b1._rankings == b2._rankings
+        assert [r.credits for r in b1._rankings]\
+            == [r.credits for r in b2._rankings]
+
     def test_dump(self, tmpdir):
         tmpfile = str(tmpdir) + '/optimized.json'
         b = il.Optimized([[1, 2], [2, 3]], sample_num=3)
@@ -54,6 +75,7 @@ class TestOptimized(TestMethods):
         res = b._unbiasedness_constraints(lists, b._rankings)
         assert res.shape[0] == (3-1)*3
         assert res.shape[1] == len(b._rankings)
+        assert sparse.issparse(res)
 
         lists = [[1, 2], [2, 3]]
         b = il.Optimized(lists, sample_num=3)
@@ -146,6 +168,29 @@ class TestOptimized(TestMethods):
         self.assert_almost_equal(p[1], 0.37142857025306114)
         self.assert_almost_equal(p[2], 0.20000000240000002)
 
+    def test_solver(self):
+        lists = [[1, 2], [2, 3]]
+        ideals = {
+            (1, 2): 0.4285714273469387,
+            (2, 1): 0.37142857025306114,
+            (2, 3): 0.20000000240000002
+            }
+        for solver in ['highs', 'highs-ds', 'highs-ipm']:
+            b = il.Optimized(lists, sample_num=3, solver=solver)
+            for r, p in b.ranking_distribution:
+                self.assert_almost_equal(p, ideals[tuple(r)], 1e-6)
+            stats = b.solver_stats
+            assert stats['method'] == solver
+            assert stats['success']
+            assert stats['time'] >= 0
+            assert stats['nit'] >= 0
+            assert stats['num_rankings'] == 3
+            assert stats['num_constraints'] == 3
+
+        b = il.Optimized(lists, sample_num=3,
+            solver_options={'time_limit': 10.0})
+        assert b.solver_stats['success']
+
     def test_interleave(self):
         lists = [[1, 2], [2, 3]]
         b = il.Optimized(lists, sample_num=3)
@@ -170,6 +215,52 @@ class TestOptimized(TestMethods):
             self.assert_almost_equal(
                 float(c)/trials, ideals[tuple(r)], error_rate=0.01)
 
+    def test_interleave_many(self):
+        lists = [[1, 2], [2, 3]]
+        b = il.Optimized(lists, sample_num=3)
+        ideals = {
+            (1, 2): 0.4285714273469387,
+            (2, 1): 0.37142857025306114,
+            (2, 3): 0.20000000240000002
+            }
+        trials = 200000
+        counts = {(1, 2): 0, (2, 1): 0, (2, 3): 0}
+        for r in b.interleave_many(trials):
+            counts[tuple(r)] += 1
+        for r, c in counts.items():
+            self.assert_almost_equal(
+                float(c)/trials, ideals[tuple(r)], error_rate=0.01)
+
+        rankings = b._sample_many(100, 2, lists)
+        assert set([tuple(r) for r in rankings]) == set(ideals)
+
+    def test_sample_matches_list_scan(self):
+        def list_scan(max_length, lists, uniforms):
+            # the original sampler scanning the whole list at each step
+            result = []
+            teams = list(range(len(lists)))
+            step = 0
+            while len(result) < max_length and len(teams) > 0:
+                selected_team = teams[int(uniforms[step] * len(teams))]
+                step += 1
+                docs = [x for x in lists[selected_team] if not x in result]
+                if len(docs) > 0:
+                    result.append(docs[0])
+                else:
+                    teams.remove(selected_team)
+            return result
+
+        b = il.Optimized([[1, 2], [2, 3]], sample_num=3)
+        np.random.seed(0)
+        for _ in range(200):
+            num_rankers = np.random.randint(1, 5)
+            lists = [list(np.random.randint(0, 20,
+                size=np.random.randint(0, 15))) for _ in range(num_rankers)]
+            max_length = np.random.randint(1, 30)
+            uniforms = np.random.rand(max_length + num_rankers)
+            assert b._sample(max_length, lists, uniforms)\
+                == list_scan(max_length, lists, uniforms)
+
     def test_evaluate(self):
         lists = [[1, 2], [2, 3]]
         b = il.Optimized(lists, sample_num=3)
@@ -198,3 +289,13 @@ class TestOptimized(TestMethods):
             self.evaluate(il.Optimized, rankings[r], [0], set(ideals[r][1]))
             self.evaluate(il.Optimized, rankings[r], [1], set(ideals[r][2]))
             self.evaluate(il.Optimized, rankings[r], [], set(ideals[r][3]))
+
+    def test_evaluate_batch(self):
+        lists = [[1, 2, 3], [2, 3, 4], [4, 1, 5]]
+        b = il.Optimized(lists, sample_num=10)
+        rankings = b.interleave_many(50)
+        clicks_list = self.random_clicks(rankings)
+        self.evaluate_batch(il.Optimized, rankings, clicks_list)
+        compacts = [b.compact(r) for r in rankings]
+        assert np.allclose(il.Optimized.compute_scores_batch(compacts, clicks_list),
+            il.Optimized.compute_scores_batch(rankings, clicks_list))
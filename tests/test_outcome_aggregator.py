@@ -0,0 +1,105 @@
+import interleaving as il
+import numpy as np
+import pytest
+from .test_methods import TestMethods
+
+class TestOutcomeAggregator(TestMethods):
+
+    def test_add(self):
+        aggregator = il.OutcomeAggregator(3)
+        aggregator.add({0: 2, 1: 1, 2: 1})
+        aggregator.add([0, 1, 3])
+        assert aggregator.count == 2
+        assert aggregator.wins.tolist() == [[0, 1, 1], [1, 0, 0], [1, 1, 0]]
+        assert aggregator.losses.tolist() == [[0, 1, 1], [1, 0, 1], [1, 0, 0]]
+        assert aggregator.ties.tolist() == [[0, 0, 0], [0, 0, 1], [0, 1, 0]]
+        assert aggregator.sums[0, 1] == 0
+        assert aggregator.sums[2, 0] == 2
+        assert aggregator.squares[2, 1] == 4
+        P = aggregator.preference_matrix()
+        assert P[0, 1] == 0.5
+        assert P[2, 1] == 0.75
+        assert P[1, 2] == 0.25
+        assert (np.diag(P) == 0.5).all()
+
+    def test_add_batch(self):
+        scores = np.random.randint(0, 3, size=(100, 4))
+        a = il.OutcomeAggregator(4)
+        a.add_batch(scores, chunk_size=7)
+        b = il.OutcomeAggregator(4)
+        for row in scores:
+            b.add(row)
+        for attr in ['count', 'wins', 'ties', 'sums', 'squares']:
+            assert np.all(getattr(a, attr) == getattr(b, attr))
+
+        _, wins, ties = il.TeamDraft.evaluate_batch(
+            [il.TeamDraft([[1, 2], [2, 3]]).interleave()] * 3,
+            [[0], [1], [0, 1]])
+        c = il.OutcomeAggregator(2)
+        c.add_batch(il.TeamDraft.compute_scores_batch(
+            [il.TeamDraft([[1, 2], [2, 3]]).interleave()] * 3,
+            [[0], [1], [0, 1]]))
+        assert np.all(c.wins == wins)
+        assert np.all(c.ties == ties)
+
+    def test_add_outcome(self):
+        aggregator = il.OutcomeAggregator(3)
+        aggregator.add_outcome([(0, 1), (0, 2)])
+        aggregator.add_outcome([(2, 1)])
+        assert aggregator.wins.tolist() == [[0, 1, 1], [0, 0, 0], [0, 1, 0]]
+        assert aggregator.ties[0, 2] == 1
+        assert aggregator.sums[0, 1] == 1
+
+    def test_merge(self):
+        scores = np.random.rand(50, 3)
+        a = il.OutcomeAggregator(3)
+        a.add_batch(scores)
+        b = il.OutcomeAggregator(3)
+        b.add_batch(scores[:20])
+        c = il.OutcomeAggregator(3)
+        c.add_batch(scores[20:])
+        b.merge(c)
+        for attr in ['count', 'wins', 'ties']:
+            assert np.all(getattr(a, attr) == getattr(b, attr))
+        assert np.allclose(a.sums, b.sums)
+        assert np.allclose(a.squares, b.squares)
+        with pytest.raises(ValueError):
+            a.merge(il.OutcomeAggregator(2))
+
+    def test_confidence_intervals(self):
+        scores = np.random.rand(1000, 2)
+        scores[:, 0] += 0.1
+        aggregator = il.OutcomeAggregator(2)
+        aggregator.add_batch(scores)
+        lower, upper = aggregator.confidence_intervals(alpha=0.05)
+        diff = scores[:, 0] - scores[:, 1]
+        stderr = np.std(diff, ddof=1) / np.sqrt(len(diff))
+        self.assert_almost_equal(lower[0, 1], np.mean(diff) - 1.96 * stderr,
+            1e-3)
+        self.assert_almost_equal(upper[0, 1], np.mean(diff) + 1.96 * stderr,
+            1e-3)
+        assert lower[0, 1] > 0
+        assert upper[1, 0] < 0
+
+        lower, upper = il.OutcomeAggregator(2).confidence_intervals()
+        assert np.isinf(lower).all() and np.isinf(upper).all()
+
+    def test_p_values(self):
+        aggregator = il.OutcomeAggregator(3)
+        for _ in range(10):
+            aggregator.add([1, 0, 0])
+        aggregator.add([0, 1, 0])
+        p = aggregator.p_values()
+        self.assert_almost_equal(p[0, 1], 2 * 12 / 2 ** 11, 1e-10)
+        assert p[0, 1] == p[1, 0]
+        assert p[1, 2] == 1.0
+        assert p[0, 0] == 1.0
+
+    def test_measure_error(self):
+        aggregator = il.OutcomeAggregator(3)
+        il_result = [[(0, 2)], [(2, 0), (2, 1)], [(2, 0), (1, 0)]]
+        for res in il_result:
+            aggregator.add_outcome(res)
+        ndcg_result = {0: 0.2, 1: 0.1, 2: 0.3}
+        error = il.simulation.Simulator.measure_error(aggregator, ndcg_result)
+        assert error == 2 / 6
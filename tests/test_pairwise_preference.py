@@ -1,6 +1,7 @@
 import interleaving as il
 from interleaving import PairwisePreferenceRanking
 import json
+import numpy as np
 from .test_methods import TestMethods
 
 class TestPairwisePreference(TestMethods):
@@ -29,6 +30,24 @@ class TestPairwisePreference(TestMethods):
         assert tuple(res.lists[1]) == tuple([2, 3])
 
 
+    def test_interleave_many(self):
+        self.interleave_many(il.PairwisePreference, [[1, 2], [2, 3]], 3,
+                        [(1, 2, 3), (1, 3, 2), (2, 1, 3), (2, 3, 1)])
+        self.interleave_many(il.PairwisePreference, [[1, 2], [3, 4]], 2,
+                        [(1, 2), (1, 3), (1, 4), (3, 1), (3, 2), (3, 4)])
+
+    def test_sample_many(self):
+        lists = [list(np.random.permutation(50)[:30]) for _ in range(20)]
+        pp = il.PairwisePreference(lists, max_length=25)
+        np.random.seed(0)
+        rankings = pp.interleave_many(100)
+        np.random.seed(0)
+        uniforms = np.random.rand(100, 25)
+        assert rankings == [pp._sample(25, lists, u) for u in uniforms]
+        for ranking in rankings:
+            assert len(set(ranking)) == 25
+            assert ranking.rank_index is pp.rank_index
+
     def test_pairwise_preference_ranking(self):
         pp = il.PairwisePreference([[1, 2, 3], [2, 3, 1]], sample_num=100)
         rankings, _ = zip(*pp.ranking_distribution)
@@ -134,6 +153,51 @@ class TestPairwisePreference(TestMethods):
         assert scores[1] == -1
         assert scores[2] ==  1
 
+    def test_compute_scores_with_rank_index(self):
+        lists = [[1, 2, 3, 4, 5], [3, 6, 1, 7, 2], [8, 3, 1, 2, 9]]
+        pp = il.PairwisePreference(lists)
+        for ranking in pp.interleave_many(20):
+            assert ranking.rank_index is pp.rank_index
+            plain = PairwisePreferenceRanking(lists, ranking)
+            for clicks in [[0], [2], [1, 3], [0, 2, 4]]:
+                assert pp.compute_scores(ranking, clicks)\
+                    == pp.compute_scores(plain, clicks)
+
+    def test_compute_scores_matches_reference(self):
+        def reference(ranking, clicks):
+            # the original implementation based on list scans
+            pp = il.PairwisePreference
+            scores = {i: 0.0 for i in range(len(ranking.lists))}
+            for sup, inf in pp._find_preferences(ranking, clicks):
+                r_under = pp._find_highest_rank_for_ranking(ranking, sup, inf)
+                r_above = pp._find_highest_rank_for_all(ranking.lists, sup, inf)
+                if r_under < r_above:
+                    continue
+                w = pp._compute_probability(r_above, ranking.lists, sup, inf)
+                for i, r in enumerate(ranking.lists):
+                    sup_rank = pp._get_rank(r, sup)
+                    inf_rank = pp._get_rank(r, inf)
+                    if sup_rank < inf_rank:
+                        scores[i] += 1 / w
+                    elif sup_rank > inf_rank:
+                        scores[i] -= 1 / w
+            return scores
+
+        np.random.seed(0)
+        for _ in range(30):
+            num_rankers = np.random.randint(2, 5)
+            lists = [list(np.random.permutation(30)[:20])
+                for _ in range(num_rankers)]
+            pp = il.PairwisePreference(lists, max_length=15)
+            for ranking in pp.interleave_many(5):
+                clicks = sorted(np.random.choice(15,
+                    size=np.random.randint(0, 5), replace=False))
+                scores = pp.compute_scores(ranking, clicks)
+                expected = reference(ranking, clicks)
+                assert set(scores) == set(expected)
+                for i in expected:
+                    assert np.isclose(scores[i], expected[i])
+
     def test_find_highest_rank_for_all(self):
         rankings = [
             [0, 1, 2, 3, 4],
@@ -209,3 +273,10 @@ class TestPairwisePreference(TestMethods):
         w = il.PairwisePreference._compute_probability(r_above, rankings, sup, inf)
         ideal_w = (1 - 1 / (3 - 1)) * (1 - 1 / (4 - 2))
         assert w == ideal_w
+
+    def test_evaluate_batch(self):
+        lists = [[1, 2, 3, 4], [2, 3, 4, 1], [4, 1, 5, 2]]
+        pp = il.PairwisePreference(lists, sample_num=10)
+        rankings = pp.interleave_many(50)
+        self.evaluate_batch(il.PairwisePreference, rankings,
+            self.random_clicks(rankings))
@@ -3,13 +3,15 @@ from interleaving import ProbabilisticRanking
 from interleaving import TeamRanking
 import json
 import numpy as np
+import pickle
 from collections import defaultdict
 from .test_methods import TestMethods
 
 class TestProbabilistic(TestMethods):
     def test_score_interleave(self):
         ranking = ProbabilisticRanking([[1, 2], [2, 3]], [1, 2])
-        result = il.Probabilistic.compute_scores(ranking, [0, 1])
+        result = il.Probabilistic.compute_scores(ranking, [0, 1],
+            engine='enumerate')
         assert result.allocations == {
             (0, 0): ([2, 0], 1 / (1 + 0.125) * (0.125 / (0.125))),
             (0, 1): ([1, 1], 1 / (1 + 0.125) * (1 / (1 + 0.125))),
@@ -17,6 +19,73 @@ class TestProbabilistic(TestMethods):
             (1, 1): ([0, 2], 0.0),
         }
 
+    def test_score_interleave_dp(self):
+        ranking = ProbabilisticRanking([[1, 2], [2, 3]], [1, 2])
+        result = il.Probabilistic.compute_scores(ranking, [0, 1],
+            allocations=True)
+        self.assert_almost_equal(result[0], 1 / (1 + 0.125))
+        self.assert_almost_equal(result[1], 0.0)
+        assert set(result.allocations) == {(2, 0), (1, 1), (0, 2)}
+        self.assert_almost_equal(result.allocations[(1, 1)],
+            1 / (1 + 0.125) * (1 / (1 + 0.125)))
+
+        result = il.Probabilistic.compute_scores(ranking, [0, 1])
+        assert result.allocations is None
+
+    def test_score_interleave_dp_matches_enumerate(self):
+        for _ in range(20):
+            docs = list(range(12))
+            a = list(np.random.permutation(docs)[:8])
+            b = list(np.random.permutation(docs)[:8])
+            ranking = il.Probabilistic([a, b]).interleave()
+            clicks = sorted(np.random.choice(len(ranking),
+                np.random.randint(0, len(ranking)), replace=False))
+            ideal = il.Probabilistic.compute_scores(ranking, clicks,
+                engine='enumerate')
+            result = il.Probabilistic.compute_scores(ranking, clicks,
+                allocations=True)
+            for i in [0, 1]:
+                assert abs(ideal[i] - result[i]) < 1e-12
+            marginals = defaultdict(float)
+            for c, p in ideal.allocations.values():
+                marginals[tuple(c)] += p
+            for c, p in marginals.items():
+                assert abs(result.allocations[c] - p) < 1e-12
+
+    def test_score_interleave_long(self):
+        ranking = il.Probabilistic(
+            [list(range(100)), list(range(100))[::-1]]).interleave()
+        result = il.Probabilistic.compute_scores(ranking, [0, 3, 10, 50])
+        assert 0.0 <= result[0] + result[1] <= 1.0
+
+    def test_score_interleave_sample(self):
+        np.random.seed(0)
+        for _ in range(10):
+            a = list(np.random.permutation(200)[:100])
+            b = list(np.random.permutation(200)[:100])
+            ranking = il.Probabilistic([a, b]).interleave()
+            clicks = sorted(np.random.choice(len(ranking), 10, replace=False))
+            ideal = il.Probabilistic.compute_scores(ranking, clicks,
+                allocations=True)
+            result = il.Probabilistic.compute_scores(ranking, clicks,
+                n=10**4, engine='sample', allocations=True)
+            assert ideal.standard_errors is None
+            for i in [0, 1]:
+                assert abs(ideal[i] - result[i])\
+                    <= 5 * result.standard_errors[i] + 1e-12
+            assert set(result.allocations) == set(ideal.allocations)
+            self.assert_almost_equal(sum(result.allocations.values()),
+                sum(ideal.allocations.values()))
+
+        ranking = ProbabilisticRanking([[1, 2], [2, 3]], [1, 2])
+        result = il.Probabilistic.compute_scores(ranking, [0, 1],
+            n=10**4, engine='sample')
+        assert abs(result[0] - 1 / (1 + 0.125))\
+            <= 5 * result.standard_errors[0]
+        assert result[1] == 0.0
+        assert result.standard_errors[1] == 0.0
+        assert result.allocations is None
+
     def test_evaluate_interleave(self):
         ranking = ProbabilisticRanking(
             [[1, 2, 3, 4], [2, 3, 4, 1]],
@@ -71,6 +140,24 @@ class TestProbabilistic(TestMethods):
             assert ideal[a][0] == result.allocations[a][0]
             self.assert_almost_equal(ideal[a][1], result.allocations[a][1])
 
+    def test_score_multileave_lazy_allocations(self):
+        lists = [list(np.random.permutation(20)[:10]) for _ in range(4)]
+        ranking = il.Probabilistic(lists).interleave()
+        # no assignment is skipped if n is large enough
+        result = il.Probabilistic.compute_scores(ranking, [0, 2, 5], n=10**7)
+        assert result._allocations is None
+        restored = pickle.loads(pickle.dumps(result))
+        allocations = result.allocations
+        assert restored.allocations == allocations
+        self.assert_almost_equal(sum([p for _, p in allocations.values()]),
+            1.0)
+        for i in range(len(lists)):
+            self.assert_almost_equal(result[i],
+                sum([o[i] * p for o, p in allocations.values()]))
+        for a, (o, _) in allocations.items():
+            assert len(a) == len(ranking[:6])
+            assert sum(o) == 3
+
     def test_evaluate_multileave(self):
         ranking = ProbabilisticRanking([[1, 2], [2, 1], [2, 3]], [1, 2])
         self.evaluate(il.Probabilistic, ranking, [0, 1],
@@ -142,3 +229,47 @@ class TestProbabilistic(TestMethods):
         self.assert_almost_equal(result[0] / n, 1.0 / denominator)
         self.assert_almost_equal(result[1] / n, 1.0 / 4.0 / denominator)
         self.assert_almost_equal(result[2] / n, 1.0 / 9.0 / denominator)
+
+    def test_sampling_after_deletion(self):
+        n = 5000
+        softmax = il.Probabilistic.Softmax(2.0, [0, 1, 2, 3])
+        result = defaultdict(int)
+        for i in range(n):
+            softmax.delete(1)
+            sample = softmax.sample()
+            result[sample] += 1
+            softmax.reset()
+
+        denominator = np.sum([1.0, 1.0 / 9.0, 1.0 / 16.0])
+        assert result[1] == 0
+        self.assert_almost_equal(result[0] / n, 1.0 / denominator)
+        self.assert_almost_equal(result[2] / n, 1.0 / 9.0 / denominator)
+        self.assert_almost_equal(result[3] / n, 1.0 / 16.0 / denominator)
+
+    def test_sampling_until_empty(self):
+        softmax = il.Probabilistic.Softmax(2.0, [0, 1, 2])
+        samples = []
+        for i in range(3):
+            sample = softmax.sample()
+            softmax.delete(sample)
+            samples.append(sample)
+        assert sorted(samples) == [0, 1, 2]
+        assert softmax.sample() is None
+        assert softmax.delete(0) == 0.0
+
+    def test_sample_many(self):
+        n = 5000
+        softmax = il.Probabilistic.Softmax(2.0, [0, 1, 2])
+        result = softmax.sample_many(n)
+        denominator = np.sum([1.0, 1.0 / 4.0, 1.0 / 9.0])
+        self.assert_almost_equal(np.mean(result == 0), 1.0 / denominator)
+        self.assert_almost_equal(np.mean(result == 1), 1.0 / 4.0 / denominator)
+        self.assert_almost_equal(np.mean(result == 2), 1.0 / 9.0 / denominator)
+
+        excluded = np.zeros((n, 3), dtype=bool)
+        excluded[:n//2, 0] = True
+        excluded[n//2:] = True
+        softmax.delete(2)
+        result = softmax.sample_many(n, excluded=excluded)
+        assert (result[:n//2] == 1).all()
+        assert (result[n//2:] == -1).all()
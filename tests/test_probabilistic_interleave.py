@@ -73,3 +73,36 @@ class TestProbabilisticInterleave(TestMethods):
         pm = il.Probabilistic(rankings)
         assert 2 == len(pm.interleave())
 
+
+    def test_interleave_many(self):
+        pm = il.Probabilistic([[0, 1], [1, 2]])
+        rankings = pm.interleave_many(self.n)
+        assert len(rankings) == self.n
+        ideals = {0: 0.44444, 1: 0.50000, 2: 0.05556}
+        for d in ideals:
+            count = len([r for r in rankings if r[0] == d])
+            self.assert_almost_equal(ideals[d], count / self.n)
+        for r in rankings:
+            assert len(r) == 2
+            assert len(set(r)) == 2
+
+    def test_interleave_many_without_replacement(self):
+        lists = [[1, 2], [1, 3]]
+        pm = il.Probabilistic(lists, replace=False)
+        ideal_prob = {
+            (1, 2): 0.444444444, (1, 3): 0.444444444,
+            (2, 1): 0.049382716, (2, 3): 0.00617284,
+            (3, 1): 0.049382716, (3, 2): 0.00617284
+        }
+        counts = defaultdict(int)
+        for r in pm.interleave_many(20000):
+            counts[tuple(r)] += 1
+        assert set(counts) == set(ideal_prob)
+        for r, p in ideal_prob.items():
+            self.assert_almost_equal(counts[r] / 20000, p)
+
+    def test_interleave_many_no_shortage(self):
+        rankings = [[0, 1], [0, 1, 2]]
+        pm = il.Probabilistic(rankings, max_length=3)
+        for r in pm.interleave_many(100):
+            assert sorted(r) == [0, 1, 2]
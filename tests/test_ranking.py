@@ -0,0 +1,102 @@
+import interleaving as il
+from interleaving import CreditRanking
+from interleaving import RankIndex
+from interleaving import TeamRanking
+from interleaving import Vocabulary
+import numpy as np
+import pytest
+from .test_methods import TestMethods
+
+class TestRanking(TestMethods):
+
+    def assert_round_trip(self, method, ranking):
+        compact = method.compact(ranking)
+        assert len(compact) == len(ranking)
+        assert compact.docs.dtype.itemsize == 1
+        result = method.expand(compact)
+        assert type(result) == type(ranking)
+        assert result == ranking
+        assert hash(result) == hash(ranking)
+        assert result.dumpd() == ranking.dumpd()
+        assert method.compact(result) == compact
+        assert hash(method.compact(result)) == hash(compact)
+        return compact
+
+    def test_vocabulary(self):
+        vocabulary = Vocabulary([[1, 2, 3], [3, 4]])
+        assert len(vocabulary) == 4
+        assert list(vocabulary.encode([4, 1])) == [3, 0]
+        assert vocabulary.decode([3, 0]) == [4, 1]
+        with pytest.raises(ValueError):
+            vocabulary.encode([5])
+
+    def test_rank_index(self):
+        lists = [[1, 2, 3, 2], [3, 4]]
+        index = RankIndex(lists)
+        assert len(index) == 4
+        assert 4 in index
+        assert not 5 in index
+        assert index.rank(0, 2) == 1
+        assert index.rank(1, 2) == 2
+        assert index.rank(0, 5) == 4
+        assert index.ranks(3) == (2, 0)
+        assert index.ranks(5) == (4, 2)
+        assert index.is_within(0, 2, 1)
+        assert not index.is_within(0, 3, 1)
+        assert not index.is_within(1, 1, 5)
+        for i, l in enumerate(lists):
+            for docid in [1, 2, 3, 4, 5]:
+                assert index.is_within(i, docid, 1) == (docid in l[:2])
+        assert index.is_built_from(lists)
+        assert not index.is_built_from([list(l) for l in lists])
+
+        method = il.PairwisePreference(lists)
+        assert method.interleave().rank_index is method.rank_index
+
+    def test_team_ranking(self):
+        method = il.TeamDraft([[1, 2, 3], [2, 3, 1]])
+        for ranking in method.interleave_many(10):
+            compact = self.assert_round_trip(method, ranking)
+            assert compact.teams is not None
+            for docid, team in zip(ranking, compact.teams):
+                assert docid in ranking.teams[team]
+
+        ranking = TeamRanking(team_indices=[0, 1], contents=[1, 2])
+        ranking.teams[0].add(3)
+        with pytest.raises(ValueError):
+            method.compact(ranking)
+
+    def test_credit_ranking(self):
+        method = il.Optimized([[1, 2], [2, 3]], sample_num=3)
+        for ranking in method._rankings:
+            compact = self.assert_round_trip(method, ranking)
+            assert compact.credits.shape == (2, 2)
+
+        ranking = CreditRanking(num_rankers=2, contents=[1, 2])
+        ranking.credits[0][1] = 1.0
+        ranking = method.expand(method.compact(ranking))
+        assert dict(ranking.credits[0]) == {1: 1.0}
+        assert dict(ranking.credits[1]) == {}
+
+    def test_balanced_ranking(self):
+        method = il.Balanced([[1, 2], [2, 3]])
+        for ranking in method.interleave_many(10):
+            self.assert_round_trip(method, ranking)
+
+        ranking = il.Balanced([[1, 2], [3, 2]]).interleave()
+        with pytest.raises(ValueError):
+            method.compact(ranking)
+
+    def test_lists_ranking(self):
+        for m in [il.Probabilistic, il.PairwisePreference]:
+            method = m([[1, 2, 3], [2, 3, 4]])
+            for ranking in method.interleave_many(10):
+                self.assert_round_trip(method, ranking)
+
+    def test_distribution(self):
+        method = il.TeamDraft([[1, 2, 3], [2, 3, 1]], sample_num=100)
+        compacts = {method.compact(r): p
+            for r, p in method.ranking_distribution}
+        assert len(compacts) == len(method._rankings)
+        for r, p in method.ranking_distribution:
+            assert compacts[method.compact(r)] == p
@@ -0,0 +1,66 @@
+import interleaving as il
+from interleaving import check_random_state
+from interleaving import spawn
+import numpy as np
+import pytest
+from .test_methods import TestMethods
+
+class TestRng(TestMethods):
+
+    def test_check_random_state(self):
+        assert check_random_state(None) is np.random.mtrand._rand
+        rng = np.random.default_rng(1)
+        assert check_random_state(rng) is rng
+        rs = np.random.RandomState(1)
+        assert check_random_state(rs) is rs
+        assert check_random_state(1).random()\
+            == np.random.default_rng(1).random()
+        with pytest.raises(ValueError):
+            check_random_state('seed')
+
+    def test_spawn(self):
+        for seed in [1, np.random.RandomState(1)]:
+            streams = spawn(seed, 3)
+            assert len(streams) == 3
+            values = [s.random() for s in streams]
+            assert len(set(values)) == 3
+        assert [s.random() for s in spawn(1, 3)]\
+            == [s.random() for s in spawn(1, 3)]
+        rng = np.random.default_rng(1)
+        assert spawn(rng, 1)[0].random() != spawn(rng, 1)[0].random()
+
+    def test_methods(self):
+        lists = [[1, 2, 3, 4], [2, 5, 1, 6]]
+        for method in [il.Balanced, il.TeamDraft, il.Probabilistic,
+            il.PairwisePreference]:
+            rankings = []
+            for _ in range(2):
+                m = method(lists, random_state=1)
+                rankings.append([m.interleave() for _ in range(10)]
+                    + m.interleave_many(10))
+            assert rankings[0] == rankings[1]
+
+        for method in [il.TeamDraft, il.Optimized]:
+            rankings = []
+            for _ in range(2):
+                m = method(lists, sample_num=8,
+                    random_state=np.random.default_rng(2))
+                rankings.append([m.interleave() for _ in range(10)]
+                    + m.interleave_many(10))
+            assert rankings[0] == rankings[1]
+
+    def test_parallel_sampling(self):
+        lists = [[1, 2, 3, 4], [5, 6, 7, 8]]
+        b1 = il.Optimized(lists, sample_num=8, n_jobs=3, random_state=1)
+        b2 = il.Optimized(lists, sample_num=8, n_jobs=3, random_state=1)
+        assert b1._rankings == b2._rankings
+
+    def test_user(self):
+        ranking = list(range(10))
+        relevance = {d: d % 2 for d in ranking}
+        clicks = []
+        for _ in range(2):
+            user = il.simulation.User([0.3, 0.8], [0.0, 0.1], random_state=3)
+            clicks.append([user.examine(ranking, relevance)
+                for _ in range(10)])
+        assert clicks[0] == clicks[1]
@@ -2,6 +2,7 @@ import os
 import pytest
 import math
 import interleaving as il
+from interleaving.simulation.document import Document
 import numpy as np
 from collections import defaultdict
 
@@ -25,6 +26,73 @@ class TestSimulation(object):
         assert result[(0, 2)] > result[(2, 0)]
         assert result[(1, 2)] > result[(2, 1)]
 
+    def test_simulator_evaluate_in_parallel(self, data_filepaths):
+        rankers = [il.simulation.Ranker(lambda x: x[1]),
+            il.simulation.Ranker(lambda x: x[2]),
+            il.simulation.Ranker(lambda x: x[3])]
+        results = []
+        for _ in range(2):
+            sim = il.simulation.Simulator(data_filepaths, 50,
+                random_state=1, n_jobs=3)
+            user = il.simulation.User(click_probs=[0.0, 0.5, 1.0],
+                stop_probs=[0.0, 0.0, 0.0])
+            results.append(sim.evaluate(rankers, user, il.TeamDraft))
+        assert len(results[0]) == 50
+        assert results[0] == results[1]
+        result = defaultdict(int)
+        for r in results[0]:
+            for (i, j) in r:
+                result[(i, j)] += 1
+        assert result[(0, 1)] > result[(1, 0)]
+        assert result[(0, 2)] > result[(2, 0)]
+        assert result[(1, 2)] > result[(2, 1)]
+
+    def test_experiment(self, data_filepaths):
+        sim = il.simulation.Simulator(data_filepaths, 20, random_state=1)
+        calls = defaultdict(int)
+        def scorer(i):
+            def score(x):
+                calls[i] += 1
+                return x[i]
+            return score
+        rankers = [il.simulation.Ranker(scorer(i)) for i in [1, 2, 3]]
+        experiment = sim.experiment(rankers, il.Optimized, sample_num=10)
+        users = [il.simulation.User(click_probs=[0.0, 0.5, 1.0],
+            stop_probs=[p, p, p]) for p in [0.0, 0.5]]
+        results = [experiment.evaluate(user) for user in users]
+        assert [len(res) for res in results] == [20, 20]
+        methods = dict(experiment.methods)
+        assert all(isinstance(m, il.Optimized) for m in methods.values())
+        num_calls = dict(calls)
+        assert num_calls == {i: len(sim.dataset) for i in [1, 2, 3]}
+
+        # rankers and method instances are reused
+        experiment.evaluate(users[0])
+        sim.ndcg(rankers, 2)
+        assert calls == num_calls
+        for q, m in methods.items():
+            assert experiment.methods[q] is m
+            assert m.lists == [sim._ranked_list(r, q) for r in rankers]
+
+        sim.clear_cache()
+        sim.ndcg(rankers, 2)
+        assert calls == {i: 2 * len(sim.dataset) for i in [1, 2, 3]}
+
+    def test_experiment_in_parallel(self, data_filepaths):
+        rankers = [il.simulation.Ranker(lambda x: x[1]),
+            il.simulation.Ranker(lambda x: x[2])]
+        results = []
+        for _ in range(2):
+            sim = il.simulation.Simulator(data_filepaths, 30,
+                random_state=1, n_jobs=2)
+            experiment = sim.experiment(rankers, il.Probabilistic,
+                sample_num=10)
+            user = il.simulation.User(click_probs=[0.0, 0.5, 1.0],
+                stop_probs=[0.0, 0.0, 0.0])
+            results.append([experiment.evaluate(user) for _ in range(2)])
+        assert results[0] == results[1]
+        assert [len(res) for res in results[0]] == [30, 30]
+
     def test_simulator_ndcg(self, data_filepaths):
         sim = il.simulation.Simulator(data_filepaths, 1)
 
@@ -40,6 +108,102 @@ class TestSimulation(object):
         ndcg_2 = (1.0 / np.log2(3.0)) / (2.0 + 1.0 / np.log2(3.0))
         assert np.abs(ndcgs[2] - ndcg_2) < 10e-10
 
+    def test_dataset(self, data_filepaths):
+        dataset = il.simulation.Dataset.load(data_filepaths)
+        with open(data_filepaths[0]) as f:
+            documents = [Document.readline(line) for line in f]
+        assert len(dataset) == len(documents)
+        assert dataset.qids == [str(q) for q in range(1, 8)]
+        views = [v for q in dataset.qids for v in dataset.documents(q)]
+        for view, document in zip(views, documents):
+            assert view.rel == document.rel
+            assert view.qid == document.qid
+            assert view.features == document.features
+        # explicit zeros are kept
+        assert views[0].features == {1: 0.0, 2: 0.0, 3: 2.0}
+
+    def test_dataset_grouping(self, tmpdir):
+        filepath = str(tmpdir) + '/data.txt'
+        with open(filepath, 'w') as f:
+            f.write('1 qid:b 1:0.5 3:1 # comment\n')
+            f.write('\n')
+            f.write('0 qid:a 2:-1.5\n')
+            f.write('2 qid:b  1:2\n')
+        dataset = il.simulation.Dataset.load([filepath])
+        assert dataset.qids == ['b', 'a']
+        assert list(dataset.offsets) == [0, 2, 3]
+        assert list(dataset.rels) == [1, 2, 0]
+        assert [v.features for v in dataset.documents('b')]\
+            == [{1: 0.5, 3: 1.0}, {1: 2.0}]
+        assert [v.features for v in dataset.documents('a')] == [{2: -1.5}]
+        assert dataset.qid_of(2) == 'a'
+
+    def test_dataset_cache(self, data_filepaths, tmpdir):
+        cache_dir = str(tmpdir) + '/cache'
+        dataset = il.simulation.Dataset.load(data_filepaths)
+        first = il.simulation.Dataset.load(data_filepaths, cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+        cached = il.simulation.Dataset.load(data_filepaths, cache_dir=cache_dir)
+        # arrays are memory-mapped
+        assert not cached.features.data.flags.owndata
+        for d in [first, cached]:
+            assert (d.features != dataset.features).nnz == 0
+            assert list(d.rels) == list(dataset.rels)
+            assert list(d.offsets) == list(dataset.offsets)
+            assert d.qids == dataset.qids
+
+        # a modified file is parsed again
+        filepath = str(tmpdir) + '/data.txt'
+        with open(filepath, 'w') as f:
+            f.write('1 qid:1 1:0.5\n')
+        il.simulation.Dataset.load([filepath], cache_dir=cache_dir)
+        with open(filepath, 'w') as f:
+            f.write('2 qid:1 1:0.5 2:1\n')
+        dataset = il.simulation.Dataset.load([filepath], cache_dir=cache_dir)
+        assert list(dataset.rels) == [2]
+        assert dataset.documents('1')[0].features == {1: 0.5, 2: 1.0}
+        assert len(os.listdir(cache_dir)) == 2
+
+        sim = il.simulation.Simulator(data_filepaths, 1, cache_dir=cache_dir)
+        assert not sim.dataset.features.data.flags.owndata
+
+    def test_rankers(self, data_filepaths):
+        dataset = il.simulation.Dataset.load(data_filepaths)
+        dict_ranker = il.simulation.Ranker(lambda x: x[2] - 0.5 * x[1])
+        rankers = [
+            il.simulation.MatrixRanker(
+                lambda m: (m[:, 2] - 0.5 * m[:, 1]).toarray().ravel()),
+            il.simulation.LinearRanker([0.0, -0.5, 1.0]),
+        ]
+        expected = dict_ranker.score_dataset(dataset)
+        for ranker in rankers:
+            assert np.allclose(ranker.score_dataset(dataset), expected)
+        for q in dataset.qids:
+            documents = dataset.documents(q)
+            ideal = dict_ranker.rank(documents)
+            for ranker in rankers:
+                assert ranker.rank(documents) == ideal
+
+        # ties keep the original order as sorted(..., reverse=True)
+        documents = dataset.documents('1')
+        ranker = il.simulation.LinearRanker([0.0])
+        assert ranker.rank(documents) == documents
+
+    def test_simulator_linear_rankers(self, data_filepaths):
+        sim = il.simulation.Simulator(data_filepaths, 10)
+        rankers = [il.simulation.Ranker(lambda x: x[1]),
+            il.simulation.Ranker(lambda x: x[2]),
+            il.simulation.Ranker(lambda x: x[3])]
+        linear_rankers = [il.simulation.LinearRanker(np.eye(4)[i])
+            for i in [1, 2, 3]]
+        assert sim.ndcg(rankers, 2) == sim.ndcg(linear_rankers, 2)
+        np.random.seed(0)
+        user = il.simulation.User(click_probs=[0.0, 0.5, 1.0],
+            stop_probs=[0.0, 0.0, 0.0])
+        res = sim.evaluate(rankers, user, il.TeamDraft)
+        np.random.seed(0)
+        assert sim.evaluate(linear_rankers, user, il.TeamDraft) == res
+
     def test_measure_error(self, data_filepaths):
         # 2 > 1 > 0
         il_result = [[(0, 2)], [(2, 0), (2, 1)], [(2, 0), (1, 0)]]
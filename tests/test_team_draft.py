@@ -1,6 +1,7 @@
 import interleaving as il
 from interleaving import TeamRanking
 import json
+import numpy as np
 from .test_methods import TestMethods
 
 class TestTeamDraft(TestMethods):
@@ -24,6 +25,56 @@ class TestTeamDraft(TestMethods):
         assert set(res.teams[0]) == set([1])
         assert set(res.teams[1]) == set([3])
 
+    def test_interleave_many(self):
+        self.interleave_many(il.TeamDraft, [[1, 2], [2, 3]], 2,
+            [(1, 2), (2, 1)])
+        self.interleave_many(il.TeamDraft, [[1, 2], [3, 4]], 3,
+            [(1, 3, 2), (1, 3, 4), (3, 1, 2), (3, 1, 4)])
+        self.interleave_many(il.TeamDraft, [[1, 2], [2, 3], [3, 4]], 2,
+            [(1, 2), (1, 3), (2, 1), (2, 3), (3, 1), (3, 2)])
+
+        td = il.TeamDraft([[1, 2], [3, 4]])
+        for res in td.interleave_many(10):
+            assert set(res.teams[0]) == set([res[0], res[1]]) & set([1, 2])
+            assert set(res.teams[1]) == set([res[0], res[1]]) & set([3, 4])
+
+        td = il.TeamDraft([[1, 2, 3], [2, 3, 1]], sample_num=100)
+        rankings = td.interleave_many(100)
+        assert set(rankings) <= set(td._rankings)
+
+    def test_sample_matches_list_scan(self):
+        def list_scan(td, max_length, lists, uniforms):
+            # the original sampler scanning the whole list at each step
+            result = TeamRanking(range(len(lists)))
+            empty_teams = set()
+            step = 0
+            while len(result) < max_length:
+                selected_team = td._select_team(result.teams, empty_teams,
+                    uniforms[step])
+                step += 1
+                if selected_team is None:
+                    break
+                docs = [x for x in lists[selected_team] if not x in result]
+                if len(docs) > 0:
+                    result.append(docs[0])
+                    result.teams[selected_team].add(docs[0])
+                else:
+                    empty_teams.add(selected_team)
+            return result
+
+        np.random.seed(0)
+        for _ in range(200):
+            num_rankers = np.random.randint(1, 5)
+            lists = [list(np.random.randint(0, 20,
+                size=np.random.randint(0, 15))) for _ in range(num_rankers)]
+            max_length = np.random.randint(1, 30)
+            td = il.TeamDraft(lists, max_length=max_length)
+            uniforms = np.random.rand(max_length + num_rankers)
+            expected = list_scan(td, max_length, lists, uniforms)
+            actual = td._sample(max_length, lists, uniforms)
+            assert actual == expected
+            assert actual.teams == expected.teams
+
     def test_team_draft_ranking(self):
         td = il.TeamDraft([[1, 2, 3], [2, 3, 1]], sample_num=100)
         rankings, distributions = zip(*td.ranking_distribution)
@@ -77,3 +128,14 @@ class TestTeamDraft(TestMethods):
         self.evaluate(il.TeamDraft, ranking, [2], [(1, 0)])
         self.evaluate(il.TeamDraft, ranking, [], [])
 
+    def test_evaluate_batch(self):
+        lists = [[1, 2, 3, 4], [2, 3, 5, 1], [4, 6, 1, 2]]
+        td = il.TeamDraft(lists)
+        rankings = td.interleave_many(50)
+        self.evaluate_batch(il.TeamDraft, rankings, self.random_clicks(rankings))
+        compacts = [td.compact(r) for r in rankings]
+        clicks_list = self.random_clicks(rankings)
+        assert (il.TeamDraft.compute_scores_batch(compacts, clicks_list)
+            == il.TeamDraft.compute_scores_batch(rankings, clicks_list)).all()
+        scores, wins, ties = il.TeamDraft.evaluate_batch([], [])
+        assert scores.shape[0] == 0